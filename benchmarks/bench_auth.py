@@ -0,0 +1,45 @@
+"""
+Microbenchmark del costo de autenticación por petición.
+
+- sin caché: jwt.decode + construcción del principal en cada petición (comportamiento anterior)
+- con caché: get_principal con la caché de tokens verificados
+
+Simula N usuarios activos, cada uno reutilizando su token en muchas peticiones.
+Uso:  python -m benchmarks.bench_auth [peticiones] [usuarios]
+"""
+import os
+import sys
+import time
+
+os.environ.setdefault("SECRET_KEY", "bench-secret-key-of-at-least-32-bytes")
+
+import jwt
+
+from utils.security import SECRET_KEY, Principal, create_jwt_token, get_principal, token_cache
+
+
+def _sin_cache(token: str) -> Principal:
+    payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"], options={"require": ["exp"]})
+    return Principal.from_payload(payload)
+
+
+def _medir(nombre: str, fn, tokens: list, peticiones: int) -> None:
+    inicio = time.perf_counter()
+    for i in range(peticiones):
+        fn(tokens[i % len(tokens)])
+    total = time.perf_counter() - inicio
+    por_peticion = total / peticiones * 1e6
+    print(f"{nombre:<10} {por_peticion:8.2f} µs/petición  (~{1e6 / por_peticion:,.0f} auth/s por núcleo)")
+
+
+if __name__ == "__main__":
+    peticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    usuarios = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+    tokens = [
+        create_jwt_token("Bench", "User", f"user{i}@altus.test", True, False, f"id{i}")
+        for i in range(usuarios)
+    ]
+
+    _medir("sin caché", _sin_cache, tokens, peticiones)
+    _medir("con caché", get_principal, tokens, peticiones)
+    print(token_cache.stats())
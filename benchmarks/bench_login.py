@@ -0,0 +1,64 @@
+"""
+Benchmark de la parte de base de datos del /login (la llamada a Firebase queda fuera).
+
+- antes:   MongoClient nuevo + ping + find_one en cada petición (get_collection original)
+- después: handle cacheado sobre el pool compartido + find_one
+
+Uso:  python -m benchmarks.bench_login [iteraciones] [email]
+Requiere MONGODB_URI, DATABASE_NAME y USER_COLLECTION en el entorno (.env).
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from pymongo import MongoClient
+from pymongo.server_api import ServerApi
+
+from utils.mongodb import URI, DB, get_async_collection, connect_async_client, close_async_client
+
+USER_COLLECTION = os.getenv("USER_COLLECTION")
+
+
+def _resumen(nombre: str, tiempos: list) -> str:
+    tiempos = sorted(tiempos)
+    p95 = tiempos[int(len(tiempos) * 0.95) - 1]
+    return (f"{nombre:<8} n={len(tiempos)}  media={statistics.mean(tiempos):8.2f} ms  "
+            f"p50={statistics.median(tiempos):8.2f} ms  p95={p95:8.2f} ms")
+
+
+def login_antes(email: str) -> None:
+    client = MongoClient(URI, server_api=ServerApi("1"), tls=True, tlsAllowInvalidCertificates=True)
+    client.admin.command("ping")
+    client[DB][USER_COLLECTION].find_one({"email": email})
+
+
+async def login_despues(email: str) -> None:
+    await get_async_collection(USER_COLLECTION).find_one({"email": email})
+
+
+async def main(iteraciones: int, email: str) -> None:
+    antes = []
+    for _ in range(iteraciones):
+        inicio = time.perf_counter()
+        login_antes(email)
+        antes.append((time.perf_counter() - inicio) * 1000)
+
+    connect_async_client()
+    await login_despues(email)  # calentar el pool
+    despues = []
+    for _ in range(iteraciones):
+        inicio = time.perf_counter()
+        await login_despues(email)
+        despues.append((time.perf_counter() - inicio) * 1000)
+    close_async_client()
+
+    print(_resumen("antes", antes))
+    print(_resumen("despues", despues))
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    correo = sys.argv[2] if len(sys.argv) > 2 else "bench@altus.test"
+    asyncio.run(main(n, correo))
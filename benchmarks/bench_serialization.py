@@ -0,0 +1,67 @@
+"""
+Benchmark de serialización de listados de retos.
+
+- antes:   Retos(**doc) por documento + validación/serialización del response_model
+           (mismo camino que FastAPI: validate -> jsonable_encoder -> json.dumps)
+- después: DocSerializer (mapeo de campos precalculado) + orjson
+
+Uso:  python -m benchmarks.bench_serialization
+No necesita base de datos: los documentos BSON se generan en memoria.
+"""
+import json
+import time
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from models.retos import Retos
+from utils.serialization import DocSerializer, dumps
+
+TAMANIOS = [1_000, 10_000, 100_000]
+
+
+def _docs(n: int) -> list:
+    return [
+        {
+            "_id": ObjectId(),
+            "title": f"Reto {i}",
+            "description": "Descripción del reto con algo de texto " * 3,
+            "usuario_id": f"usuario_{i % 500}",
+            "categoria_id": f"categoria_{i % 20}",
+            "activo": True,
+            "version": 1
+        }
+        for i in range(n)
+    ]
+
+
+def antes(docs: list) -> bytes:
+    retos = []
+    for doc in docs:
+        doc = dict(doc)
+        doc["id"] = str(doc["_id"])
+        retos.append(Retos(**doc))
+    adapter = TypeAdapter(list[Retos])
+    validados = adapter.validate_python(retos, from_attributes=True)
+    return json.dumps(jsonable_encoder(validados)).encode()
+
+
+def despues(docs: list, serializer=DocSerializer(Retos)) -> bytes:
+    return dumps(serializer.many(docs))
+
+
+def _medir(fn, docs: list) -> float:
+    inicio = time.perf_counter()
+    fn(docs)
+    return (time.perf_counter() - inicio) * 1000
+
+
+if __name__ == "__main__":
+    print(f"{'docs':>8} {'antes (ms)':>12} {'después (ms)':>14} {'mejora':>8}")
+    for n in TAMANIOS:
+        docs = _docs(n)
+        assert json.loads(antes(docs[:10])) == json.loads(despues(docs[:10]))
+        t_antes = _medir(antes, docs)
+        t_despues = _medir(despues, docs)
+        print(f"{n:>8} {t_antes:>12.1f} {t_despues:>14.1f} {t_antes / t_despues:>7.1f}x")
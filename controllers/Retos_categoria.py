@@ -1,37 +1,119 @@
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import UpdateOne, ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from models.Retos_categoria import RetoCategoria
-from pymongo import MongoClient
-import os 
-from dotenv import load_dotenv
+from utils.mongodb import get_async_collection
+from pipelines.retos_papelines import pipeline_categorias_por_reto
+from controllers.categorias_controller import (
+    registrar_reto_en_categoria,
+    quitar_reto_de_categoria,
+    categoria_ids_de
+)
 
-load_dotenv()
 
-client = MongoClient(os.getenv("MONGODB_URI"))
-db = client[os.getenv("DATABASE_NAME")]
-participaciones_collection = db["Retos_categoria"]
+# Además de la colección Retos_categoria, cada reto guarda sus categorías en el
+# array "categoria_ids" (categoria_id principal + relaciones), con índice multikey
+# "categoria_ids_id": filtrar retos por categoría es una sola consulta sobre Retos.
+
+def retos_categoria_coll():
+    return get_async_collection("Retos_categoria")
+
+
+def retos_coll():
+    return get_async_collection("Retos")
+
+
+def _reto_object_id(reto_id: str) -> ObjectId:
+    if not reto_id or not ObjectId.is_valid(reto_id):
+        raise HTTPException(status_code=400, detail=f"ID de reto no válido: {reto_id}")
+    return ObjectId(reto_id)
+
+
+async def categorias_de_reto(reto_id: str, categoria_principal: str) -> list:
+    """Valor de categoria_ids para un reto: su categoría principal más las de Retos_categoria."""
+    categorias = [categoria_principal] if categoria_principal else []
+    async for relacion in retos_categoria_coll().find({"reto_id": reto_id}, {"categoria_id": 1}):
+        if relacion.get("categoria_id") and relacion["categoria_id"] not in categorias:
+            categorias.append(relacion["categoria_id"])
+    return categorias
+
 
 async def create_reto_categoria(relacion: RetoCategoria):
-    # Evitar duplicados
-    existe = await db.Retos_categoria.find_one({
-        "id_reto": relacion.id_reto,
-        "id_categoria": relacion.id_categoria
-    })
-    if existe:
-        return {"error": "La relación ya existe"}
+    reto_oid = _reto_object_id(relacion.reto_id)
+
+    # La unicidad (reto_id, categoria_id) la garantiza el índice "reto_categoria_unique"
+    try:
+        await retos_categoria_coll().insert_one(relacion.dict())
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="La relación ya existe")
 
-    await db.Retos_categoria.insert_one(relacion.dict())
+    anterior = await retos_coll().find_one_and_update(
+        {"_id": reto_oid},
+        {"$addToSet": {"categoria_ids": relacion.categoria_id}, "$inc": {"version": 1}},
+        projection={"title": 1, "categoria_id": 1, "categoria_ids": 1},
+        return_document=ReturnDocument.BEFORE
+    )
+    if anterior is None:
+        await retos_categoria_coll().delete_one({"reto_id": relacion.reto_id, "categoria_id": relacion.categoria_id})
+        raise HTTPException(status_code=404, detail="Reto no encontrado")
+
+    # Contadores de la categoría (solo si el reto no pertenecía ya, p. ej. su categoría principal)
+    if relacion.categoria_id not in categoria_ids_de(anterior):
+        await registrar_reto_en_categoria(relacion.categoria_id, relacion.reto_id, anterior.get("title"))
     return relacion
 
 
 async def get_categorias_por_reto(id_reto: str):
-    relaciones = db.Retos_categoria.find({"id_reto": id_reto})
+    relaciones = retos_categoria_coll().find({"reto_id": id_reto})
     return [RetoCategoria(**r) async for r in relaciones]
 
 
 async def delete_reto_categoria(relacion: RetoCategoria):
-    resultado = await db.Retos_categoria.delete_one({
-        "id_reto": relacion.id_reto,
-        "id_categoria": relacion.id_categoria
+    reto_oid = _reto_object_id(relacion.reto_id)
+    resultado = await retos_categoria_coll().delete_one({
+        "reto_id": relacion.reto_id,
+        "categoria_id": relacion.categoria_id
     })
     if resultado.deleted_count == 0:
         return {"error": "Relación no encontrada"}
+
+    # La categoría principal del reto se mantiene en categoria_ids
+    anterior = await retos_coll().find_one_and_update(
+        {"_id": reto_oid, "categoria_id": {"$ne": relacion.categoria_id}},
+        {"$pull": {"categoria_ids": relacion.categoria_id}, "$inc": {"version": 1}},
+        projection={"categoria_id": 1, "categoria_ids": 1},
+        return_document=ReturnDocument.BEFORE
+    )
+    if anterior is not None and relacion.categoria_id in categoria_ids_de(anterior):
+        await quitar_reto_de_categoria(relacion.categoria_id, relacion.reto_id)
     return {"message": "Relación eliminada"}
+
+
+async def reconstruir_categoria_ids() -> int:
+    """
+    Migración/reparación: recalcula categoria_ids de todos los retos a partir de
+    categoria_id y de la colección Retos_categoria. Devuelve los retos actualizados.
+    """
+    relaciones = {}
+    async for doc in retos_categoria_coll().aggregate(pipeline_categorias_por_reto()):
+        relaciones[doc["_id"]] = doc["categoria_ids"]
+
+    operaciones = []
+    actualizados = 0
+    async for reto in retos_coll().find({}, {"categoria_id": 1}):
+        principal = reto.get("categoria_id")
+        categoria_ids = [principal] if principal else []
+        categoria_ids += [c for c in relaciones.get(str(reto["_id"]), []) if c and c != principal]
+        operaciones.append(UpdateOne(
+            {"_id": reto["_id"]},
+            {"$set": {"categoria_ids": categoria_ids}, "$inc": {"version": 1}}
+        ))
+        if len(operaciones) == 500:
+            await retos_coll().bulk_write(operaciones, ordered=False)
+            actualizados += len(operaciones)
+            operaciones = []
+    if operaciones:
+        await retos_coll().bulk_write(operaciones, ordered=False)
+        actualizados += len(operaciones)
+    return actualizados
@@ -1,49 +1,85 @@
-from models.categorias import Categoria
-from utils.mongodb import get_collection
 import os
-from dotenv import load_dotenv
-from typing import List
+from models.categorias import Categoria, CategoriaConRetos
+from utils.mongodb import get_async_collection
+from typing import List, Optional
 from bson import ObjectId
 from fastapi import HTTPException, status
-from pymongo import MongoClient
-from motor.motor_asyncio import AsyncIOMotorClient
-from models.categorias import Categoria
+from pymongo import UpdateOne, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from utils.streaming import STREAM_BATCH_SIZE
+from utils.serialization import projection_for, serializer_for
 
-from pipelines.categorias_papelines import (
-    pipeline_categorias_con_retos,
-    pipeline_validar_eliminacion_categoria
+from utils.cache import get_cache, subscribe
+from pipelines.categorias_papelines import pipeline_contadores_categorias
+
+# Cantidad de retos recientes que se guardan como vista previa en cada categoría
+PREVIEW_RETOS = 5
+
+PROYECCION_CATEGORIA = {"name": 1, "text": 1, "total_retos": 1, "retos": 1, "version": 1}
+
+# Caché de lecturas: clave "all" para el listado y el id para cada categoría
+CACHE_TODAS = "all"
+categorias_cache = get_cache(
+    "categorias",
+    maxsize=int(os.getenv("CATEGORIAS_CACHE_MAXSIZE", "256")),
+    ttl=float(os.getenv("CATEGORIAS_CACHE_TTL_S", "60"))
 )
 
-load_dotenv()
 
-mongodb_uri = os.getenv("MONGODB_URI")
-client= AsyncIOMotorClient(mongodb_uri)
+def categorias_coll():
+    return get_async_collection("Categorias")
+
+
+def invalidar_categoria(categoria_id: str = None) -> None:
+    """Invalida el listado y, si se indica, la entrada de la categoría modificada."""
+    if categoria_id:
+        categorias_cache.invalidate(CACHE_TODAS, categoria_id)
+    else:
+        categorias_cache.invalidate(CACHE_TODAS)
+
+
+def _on_categoria_change(categoria_id: str = None) -> None:
+    # Cambios hechos por otros workers (change streams)
+    if categoria_id is None:
+        categorias_cache.clear()
+    else:
+        invalidar_categoria(categoria_id)
+
 
-DB= client[os.getenv("DATABASE_NAME")]
-categorias_coll = DB["Categorias"]
+subscribe("Categorias", _on_categoria_change)
+
+
+def _serializar_categoria(doc: dict) -> dict:
+    doc["id"] = str(doc.pop("_id"))
+    doc.setdefault("total_retos", 0)
+    doc.setdefault("retos", [])
+    return doc
+
+
+def _proyeccion(fields: Optional[tuple]) -> dict:
+    # version siempre se lee: la necesita el ETag
+    return projection_for(fields, base=PROYECCION_CATEGORIA, extra=("version",))
 
 
 async def create_categoria(categoria: Categoria) -> Categoria:
     """
     Crea una nueva categoría, validando unicidad de nombre
     y devolviendo el objeto con id asignado.
+    La unicidad (case-insensitive) la garantiza el índice "name_ci_unique".
     """
     try:
         name = categoria.name.strip()
         text = categoria.text.strip()
 
-        # Verificar duplicado (case‐insensitive)
-        dup = await categorias_coll.find_one({
-            "name": {"$regex": f"^{name}$", "$options": "i"}
-        })
-        if dup:
+        payload = {"name": name, "text": text, "total_retos": 0, "retos": [], "version": 1}
+        try:
+            res = await categorias_coll().insert_one(payload)
+        except DuplicateKeyError:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Ya existe una categoría con ese nombre"
             )
-
-        payload = {"name": name, "text": text}
-        res = await categorias_coll.insert_one(payload)
+        invalidar_categoria()
         categoria.id = str(res.inserted_id)
         categoria.name = name
         categoria.text = text
@@ -58,13 +94,24 @@ async def create_categoria(categoria: Categoria) -> Categoria:
         )
 
 
-async def get_categorias() -> List[dict]:
+async def get_categorias(use_cache: bool = True, fields: Optional[tuple] = None) -> List[dict]:
     """
-    Lista todas las categorías con conteo y detalle de retos asociados.
+    Lista todas las categorías con conteo y vista previa de retos asociados
+    (contadores mantenidos en el propio documento, sin $lookup).
+    Con use_cache=False se lee directo de la BD. Con fields se aprovecha la caché
+    si ya está caliente; si no, se leen de la BD solo esos campos (sin cachear).
     """
     try:
-        cursor = categorias_coll.aggregate(pipeline_categorias_con_retos())
-        return [doc async for doc in cursor]
+        if use_cache:
+            cached = categorias_cache.get(CACHE_TODAS)
+            if cached is not None:
+                return cached
+
+        cursor = categorias_coll().find({}, _proyeccion(fields))
+        categorias = [_serializar_categoria(doc) async for doc in cursor]
+        if fields is None:
+            categorias_cache.set(CACHE_TODAS, categorias)
+        return categorias
 
     except Exception as e:
         raise HTTPException(
@@ -73,22 +120,37 @@ async def get_categorias() -> List[dict]:
         )
 
 
-async def get_categoria_by_id(categoria_id: str) -> dict:
+async def stream_categorias(batch_size: int = STREAM_BATCH_SIZE, fields: Optional[tuple] = None):
+    """
+    Recorre todas las categorías en streaming, documento a documento.
+    """
+    serializar = serializer_for(CategoriaConRetos, fields)
+    async for doc in categorias_coll().find({}, _proyeccion(fields)).batch_size(batch_size):
+        yield serializar(doc)
+
+
+async def get_categoria_by_id(categoria_id: str, use_cache: bool = True, fields: Optional[tuple] = None) -> dict:
     """
     Obtiene una categoría por su ID, incluyendo retos asociados.
+    Con fields se proyectan solo esos campos (misma regla de caché que get_categorias).
     """
     try:
-        match_stage = { "$match": { "_id": ObjectId(categoria_id) } }
-        pipeline = [match_stage] + pipeline_categorias_con_retos()
-        cursor = categorias_coll.aggregate(pipeline)
-        docs = [doc async for doc in cursor]
+        if use_cache:
+            cached = categorias_cache.get(categoria_id)
+            if cached is not None:
+                return cached
+
+        doc = await categorias_coll().find_one({"_id": ObjectId(categoria_id)}, _proyeccion(fields))
 
-        if not docs:
+        if not doc:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Categoría no encontrada"
             )
-        return docs[0]
+        categoria = _serializar_categoria(doc)
+        if fields is None:
+            categorias_cache.set(categoria_id, categoria)
+        return categoria
 
     except HTTPException:
         raise
@@ -108,36 +170,27 @@ async def update_categoria(categoria_id: str, categoria: Categoria) -> dict:
         name = categoria.name.strip()
         text = categoria.text.strip()
 
-        # Verificar duplicado en otra categoría
-        dup = await categorias_coll.find_one({
-            "name": {"$regex": f"^{name}$", "$options": "i"},
-            "_id": {"$ne": ObjectId(categoria_id)}
-        })
-        if dup:
+        # El índice único "name_ci_unique" rechaza un nombre usado por otra categoría.
+        # Solo se escribe (y se incrementa version) si algún valor cambia de verdad.
+        update = {"$set": {"name": name, "text": text}, "$inc": {"version": 1}}
+        try:
+            result = await categorias_coll().update_one(
+                {"_id": ObjectId(categoria_id), "$or": [{"name": {"$ne": name}}, {"text": {"$ne": text}}]},
+                update
+            )
+        except DuplicateKeyError:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Otra categoría ya usa ese nombre"
             )
 
-        update = {"$set": {"name": name, "text": text}}
-        result = await categorias_coll.update_one(
-            {"_id": ObjectId(categoria_id)},
-            update
-        )
-
-        # Si no matcheó ningún documento -> no existe
+        # Sin match: o no existe (get_categoria_by_id responde 404) o no hubo cambios
         if result.matched_count == 0:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Categoría no encontrada"
-            )
-
-        # Si matched_count == 1 pero modified_count == 0 -> existe pero no hubo cambios
-        if result.modified_count == 0:
-            # Devolver la categoría actual (200) en lugar de 404
+            # Devolver la categoría actual (200), sin tocar version ni la caché
             return await get_categoria_by_id(categoria_id)
 
         # Si hubo modificaciones, devolver la categoría actualizada
+        invalidar_categoria(categoria_id)
         return await get_categoria_by_id(categoria_id)
 
     except HTTPException:
@@ -154,24 +207,19 @@ async def deactivate_categoria(categoria_id: str) -> None:
     Elimina la categoría si no tiene retos asociados.
     """
     try:
-        # 1. Verificar cantidad de retos asociados
-        pipeline = pipeline_validar_eliminacion_categoria(categoria_id)
-        cursor = categorias_coll.aggregate(pipeline)
-        docs = [doc async for doc in cursor]
-
-        if not docs:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Categoría no encontrada"
-            )
-        if docs[0]["cantidad_retos"] > 0:
+        # 1. Verificar que no existan retos asociados (lectura indexada sobre Retos)
+        asociados = await get_async_collection("Retos").count_documents(
+            filtro_retos_de_categoria(categoria_id),
+            limit=1
+        )
+        if asociados > 0:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="No se puede eliminar: existen retos asociados"
             )
 
         # 2. Eliminar
-        result = await categorias_coll.delete_one(
+        result = await categorias_coll().delete_one(
             {"_id": ObjectId(categoria_id)}
         )
         if result.deleted_count == 0:
@@ -179,6 +227,7 @@ async def deactivate_categoria(categoria_id: str) -> None:
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Categoría no encontrada"
             )
+        invalidar_categoria(categoria_id)
 
     except HTTPException:
         raise
@@ -187,3 +236,131 @@ async def deactivate_categoria(categoria_id: str) -> None:
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error eliminando categoría: {e}"
         )
+
+
+# --- Pertenencia reto-categoría ---
+
+def filtro_retos_de_categoria(categoria_id: str) -> dict:
+    """
+    Retos de una categoría: por el array multikey categoria_ids o, para retos
+    anteriores al backfill (python -m utils.jobs backfill-reto-categoria-ids),
+    por su categoria_id. Cada rama del $or usa su propio índice.
+    """
+    return {"$or": [{"categoria_ids": categoria_id}, {"categoria_id": categoria_id}]}
+
+
+def categoria_ids_de(reto: dict) -> list:
+    """Categorías de un documento de reto: su categoria_id más las de categoria_ids (si ya lo tiene)."""
+    categorias = list(reto.get("categoria_ids") or [])
+    principal = reto.get("categoria_id")
+    if principal and principal not in categorias:
+        categorias.insert(0, principal)
+    return categorias
+
+
+# --- Contadores de retos por categoría (mantenidos por los controladores de retos y Retos_categoria) ---
+
+async def registrar_reto_en_categoria(categoria_id: str, reto_id: str, title: str) -> None:
+    """Suma un reto al contador de la categoría y lo agrega al inicio de la vista previa."""
+    if not ObjectId.is_valid(categoria_id):
+        return
+    await categorias_coll().update_one(
+        {"_id": ObjectId(categoria_id)},
+        {
+            "$inc": {"total_retos": 1, "version": 1},
+            "$push": {
+                "retos": {
+                    "$each": [{"id": reto_id, "title": title}],
+                    "$position": 0,
+                    "$slice": PREVIEW_RETOS
+                }
+            }
+        }
+    )
+    invalidar_categoria(categoria_id)
+
+
+async def quitar_reto_de_categoria(categoria_id: str, reto_id: str) -> None:
+    """
+    Resta un reto del contador de la categoría y lo saca de la vista previa. Si estaba
+    en la vista previa, se rellena con los retos más recientes que siguen en la categoría.
+    Se llama después de quitar el reto de la categoría en Retos.
+    """
+    if not ObjectId.is_valid(categoria_id):
+        return
+    anterior = await categorias_coll().find_one_and_update(
+        {"_id": ObjectId(categoria_id)},
+        {
+            "$inc": {"total_retos": -1, "version": 1},
+            "$pull": {"retos": {"id": reto_id}}
+        },
+        projection={"retos": 1},
+        return_document=ReturnDocument.BEFORE
+    )
+    if anterior and any(r.get("id") == reto_id for r in anterior.get("retos") or []):
+        await _rellenar_vista_previa(categoria_id)
+    invalidar_categoria(categoria_id)
+
+
+async def _rellenar_vista_previa(categoria_id: str) -> None:
+    # Consulta indexada (categoria_ids_id / categoria_id_id) de los PREVIEW_RETOS más recientes
+    cursor = get_async_collection("Retos").find(
+        filtro_retos_de_categoria(categoria_id),
+        {"title": 1}
+    ).sort("_id", -1).limit(PREVIEW_RETOS)
+    vista_previa = [{"id": str(doc["_id"]), "title": doc.get("title")} async for doc in cursor]
+    await categorias_coll().update_one(
+        {"_id": ObjectId(categoria_id)},
+        {"$set": {"retos": vista_previa}}
+    )
+
+
+async def renombrar_reto_en_categorias(categoria_ids: list, reto_id: str, title: str) -> None:
+    """Actualiza el título del reto en la vista previa de las categorías que lo muestran."""
+    ids = [ObjectId(c) for c in categoria_ids if ObjectId.is_valid(c)]
+    if not ids:
+        return
+    result = await categorias_coll().update_many(
+        {"_id": {"$in": ids}, "retos.id": reto_id},
+        {"$set": {"retos.$.title": title}, "$inc": {"version": 1}}
+    )
+    # Si el reto no está en ninguna vista previa no cambió nada: la caché sigue siendo válida
+    if result.matched_count:
+        for categoria_id in categoria_ids:
+            invalidar_categoria(categoria_id)
+
+
+async def reconstruir_contadores_categorias() -> int:
+    """
+    Job de reparación: recalcula total_retos y la vista previa de todas las
+    categorías a partir de la colección Retos. Devuelve las categorías actualizadas.
+    """
+    contadores = {}
+    cursor = get_async_collection("Retos").aggregate(pipeline_contadores_categorias(PREVIEW_RETOS))
+    async for doc in cursor:
+        if isinstance(doc["_id"], str) and ObjectId.is_valid(doc["_id"]):
+            contadores[ObjectId(doc["_id"])] = doc
+
+    operaciones = []
+    actualizadas = 0
+    async for categoria in categorias_coll().find({}, {"_id": 1}):
+        datos = contadores.get(categoria["_id"], {})
+        operaciones.append(UpdateOne(
+            {"_id": categoria["_id"]},
+            {
+                "$set": {
+                    "total_retos": datos.get("total_retos", 0),
+                    "retos": datos.get("retos", [])
+                },
+                "$inc": {"version": 1}
+            }
+        ))
+        if len(operaciones) == 500:
+            await categorias_coll().bulk_write(operaciones, ordered=False)
+            actualizadas += len(operaciones)
+            operaciones = []
+    if operaciones:
+        await categorias_coll().bulk_write(operaciones, ordered=False)
+        actualizadas += len(operaciones)
+    categorias_cache.clear()
+    return actualizadas
@@ -1,30 +1,53 @@
 from models.comentarios import comentarios
+from utils.serialization import DocSerializer
 from fastapi import HTTPException, status
-from pymongo import MongoClient
 from bson import ObjectId
-from typing import List
-import os 
-from dotenv import load_dotenv
-from motor.motor_asyncio import AsyncIOMotorClient
+from typing import Optional
+from utils.mongodb import get_async_collection
+from utils.pagination import DEFAULT_PAGE_SIZE, encode_cursor, decode_cursor
+from utils.pubsub import comentarios_hub
+from utils.batch_writer import BatchWriter, BatchWriterStopped
+import asyncio
+import os
 
-load_dotenv()
+# Solo los campos que muestra el cliente
+PROYECCION_COMENTARIO = {"text": 1, "reto_id": 1, "usuario_id": 1}
 
-client = AsyncIOMotorClient(os.getenv("MONGODB_URI"))
-DB = client[os.getenv("DATABASE_NAME")]
-comentarios_coll = DB["Comentarios"]
+# Inserción por lotes opcional para picos de comentarios (eventos en vivo)
+COMENTARIOS_BATCH_WRITES = os.getenv("COMENTARIOS_BATCH_WRITES", "0") == "1"
+comentarios_writer = BatchWriter(
+    "Comentarios",
+    max_batch=int(os.getenv("COMENTARIOS_BATCH_SIZE", "500")),
+    max_delay_ms=float(os.getenv("COMENTARIOS_BATCH_DELAY_MS", "20"))
+)
+
+
+serializar_comentario = DocSerializer(comentarios)
+
+
+def comentarios_coll():
+    return get_async_collection("Comentarios")
 
 async def create_comentario(comentario: comentarios) -> comentarios:
     try:
         text = comentario.text.strip()
         payload={
-            text: text,
+            "text": text,
             "reto_id": comentario.reto_id,
             "usuario_id": comentario.usuario_id
         }
         
-        res =await comentarios_coll.insert_one(payload)
-        comentario.id= str(res.inserted_id)
+        inserted_id = None
+        if comentarios_writer.running:
+            try:
+                inserted_id = await comentarios_writer.submit(payload)
+            except BatchWriterStopped:
+                pass  # el writer se detuvo sin enviar el documento: se inserta directamente
+        if inserted_id is None:
+            inserted_id = (await comentarios_coll().insert_one(payload)).inserted_id
+        comentario.id= str(inserted_id)
         comentario.text = text
+        comentarios_hub.publish(comentario.reto_id, "created", comentario.model_dump())
         return comentario
     
     except Exception as e:
@@ -33,12 +56,32 @@ async def create_comentario(comentario: comentarios) -> comentarios:
             detail=f"Error creando el comentario: {e}"
         )
         
-#para obtener comentarios por reto
+#para obtener comentarios por reto (más recientes primero, paginado con "before")
+
+async def get_comentarios_de_reto(reto_id: str,
+                                  limit: int = DEFAULT_PAGE_SIZE,
+                                  before: Optional[str] = None) -> dict:
+    try:
+        filtro = {"reto_id": reto_id}
+        if before:
+            filtro["_id"] = {"$lt": decode_cursor(before)}
+
+        # Índice (reto_id, _id desc): la página y el conteo se resuelven sin leer documentos de más
+        cursor = comentarios_coll().find(filtro, PROYECCION_COMENTARIO).sort("_id", -1).limit(limit + 1)
+        docs, total = await asyncio.gather(
+            cursor.to_list(length=limit + 1),
+            comentarios_coll().count_documents({"reto_id": reto_id})
+        )
+        hay_mas = len(docs) > limit
+        docs = docs[:limit]
 
-async def get_comentarios_de_reto(reto_id:str) -> List[dict]:
-    try: 
-        cursor = await comentarios_coll.find({"reto_id": reto_id})
-        return [doc async for doc in cursor]
+        return {
+            "items": serializar_comentario.many(docs),
+            "next_before": encode_cursor(docs[-1]["_id"]) if hay_mas else None,
+            "total": total
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -50,9 +93,15 @@ async def delete_comentario(comentario_id: str):
     if not ObjectId.is_valid(comentario_id):
         raise HTTPException(status_code=400, detail="ID inválido")
 
-    resultado = await comentarios_coll.delete_one({"_id": ObjectId(comentario_id)})
+    # find_one_and_delete devuelve el reto_id para notificar a los suscriptores, sin otra consulta
+    eliminado = await comentarios_coll().find_one_and_delete(
+        {"_id": ObjectId(comentario_id)},
+        projection={"reto_id": 1}
+    )
 
-    if resultado.deleted_count == 0:
+    if eliminado is None:
         raise HTTPException(status_code=404, detail="Comentario no encontrado")
 
+    comentarios_hub.publish(eliminado.get("reto_id"), "deleted", {"id": comentario_id})
+
     return {"mensaje": "Comentario eliminado correctamente"}
\ No newline at end of file
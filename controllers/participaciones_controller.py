@@ -1,27 +1,22 @@
 from fastapi import HTTPException
 from models.participaciones import Participacion
-from pymongo import MongoClient
-import os 
-from dotenv import load_dotenv
+from pymongo.errors import DuplicateKeyError
+from utils.mongodb import get_async_collection
 
-load_dotenv()
 
-client = MongoClient(os.getenv("MONGODB_URI"))
-db = client[os.getenv("DATABASE_NAME")]
-participaciones_collection = db["Participaciones"]
+def participaciones_coll():
+    return get_async_collection("Participaciones")
 
-async def crear_participacion(participacion: Participacion):
-    existente = participaciones_collection.find_one({
-        "usuario_id": participacion.usuario_id,
-        "reto_id": participacion.reto_id
-    })
 
-    if existente:
+# La unicidad (usuario_id, reto_id) la garantiza el índice "usuario_reto_unique" (models/indexes.py)
+async def crear_participacion(participacion: Participacion):
+    try:
+        resultado = await participaciones_coll().insert_one(participacion.dict(exclude_unset=True))
+    except DuplicateKeyError:
         raise HTTPException(
             status_code=409,
             detail="El usuario ya está inscrito en este reto."
         )
 
-    resultado = participaciones_collection.insert_one(participacion.dict(exclude_unset=True))
     participacion.id = str(resultado.inserted_id)
-    return participacion
\ No newline at end of file
+    return participacion
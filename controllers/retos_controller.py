@@ -1,16 +1,36 @@
+import os
 from models.retos import Retos
 from bson import ObjectId
 from fastapi import HTTPException
-from dotenv import load_dotenv
-import os
 from typing import Optional, List
-from motor.motor_asyncio import AsyncIOMotorClient
+from utils.mongodb import get_async_collection
+from utils.pagination import DEFAULT_PAGE_SIZE, encode_cursor, decode_cursor
+from utils.streaming import STREAM_BATCH_SIZE
+from utils.serialization import DocSerializer, projection_for, serializer_for
+from pymongo import ReturnDocument
+from pipelines.retos_papelines import pipeline_detalle_reto
+from controllers.comentarios_controller import PROYECCION_COMENTARIO, serializar_comentario
+from controllers.Retos_categoria import categorias_de_reto
+from controllers.categorias_controller import (
+    registrar_reto_en_categoria,
+    quitar_reto_de_categoria,
+    renombrar_reto_en_categorias,
+    filtro_retos_de_categoria,
+    categoria_ids_de
+)
+
+
+serializar_reto = DocSerializer(Retos)
+
+# Máximo de ids por petición en el multi-get (GET /retos?ids=... y POST /retos/batch)
+MAX_BATCH_IDS = int(os.getenv("RETOS_MAX_BATCH_IDS", "100"))
+
+# Comentarios incluidos por defecto en GET /retos/{id}/detail
+DETALLE_COMENTARIOS = 20
 
-load_dotenv()
 
-client = AsyncIOMotorClient(os.getenv("MONGODB_URI"))
-DB = client[os.getenv("DATABASE_NAME")]
-retos_coll = DB["Retos"]
+def retos_coll():
+    return get_async_collection("Retos")
 
 # Crear reto
 async def create_reto(reto: Retos) -> Retos:
@@ -19,29 +39,115 @@ async def create_reto(reto: Retos) -> Retos:
             "title": reto.title.strip(),
             "description": reto.description.strip(),
             "categoria_id": reto.categoria_id,
+            "categoria_ids": [reto.categoria_id],
             "usuario_id": reto.usuario_id,
-            "activo": True  # valor por defecto
+            "activo": True,  # valor por defecto
+            "version": 1
         }
-        res = await retos_coll.insert_one(payload)
+        res = await retos_coll().insert_one(payload)
         reto.id = str(res.inserted_id)
+        reto.categoria_ids = payload["categoria_ids"]
+        await registrar_reto_en_categoria(payload["categoria_id"], reto.id, payload["title"])
         return reto
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al crear reto: {e}")
 
-# Obtener reto por ID
-async def get_reto_by_id(reto_id: str) -> dict:
+def _reto_object_id(reto_id: str) -> ObjectId:
+    if not ObjectId.is_valid(reto_id):
+        raise HTTPException(status_code=400, detail=f"ID de reto no válido: {reto_id}")
+    return ObjectId(reto_id)
+
+
+# Obtener reto por ID (con fields solo se leen esos campos, más version para el ETag)
+async def get_reto_by_id(reto_id: str, fields: Optional[tuple] = None) -> dict:
     try:
-        doc = await retos_coll.find_one({"_id": ObjectId(reto_id)})
+        doc = await retos_coll().find_one(
+            {"_id": _reto_object_id(reto_id)},
+            projection_for(fields, extra=("version",))
+        )
         if not doc:
             raise HTTPException(status_code=404, detail="Reto no encontrado")
-        doc["id"] = str(doc["_id"])
+        doc["id"] = str(doc.pop("_id"))
         return doc
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error obteniendo reto: {e}")
-    
-    
+
+
+
+# Detalle de un reto (reto + comentarios + conteos + categorías) en una sola agregación
+async def get_reto_detalle(reto_id: str,
+                           comentarios_limit: int = DETALLE_COMENTARIOS,
+                           comentarios: bool = True,
+                           conteos: bool = True,
+                           categorias: bool = True) -> dict:
+    pipeline = pipeline_detalle_reto(
+        str(_reto_object_id(reto_id)),
+        comentarios_limit,
+        PROYECCION_COMENTARIO,
+        comentarios=comentarios,
+        conteos=conteos,
+        categorias=categorias
+    )
+    try:
+        resultado = (await retos_coll().aggregate(pipeline).to_list(length=1))[0]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error obteniendo detalle del reto: {e}")
+
+    if not resultado["reto"]:
+        raise HTTPException(status_code=404, detail="Reto no encontrado")
+
+    detalle = {"reto": serializar_reto(resultado["reto"][0])}
+    if comentarios:
+        docs = resultado["comentarios"][0]["items"]
+        hay_mas = len(docs) > comentarios_limit
+        docs = docs[:comentarios_limit]
+        detalle["comentarios"] = {
+            "items": serializar_comentario.many(docs),
+            "next_before": encode_cursor(docs[-1]["_id"]) if hay_mas else None
+        }
+    if conteos:
+        detalle["conteos"] = {
+            "comentarios": resultado["total_comentarios"][0]["n"],
+            "participaciones": resultado["total_participaciones"][0]["n"]
+        }
+    if categorias:
+        detalle["categorias"] = resultado["categorias"][0]["items"]
+    return detalle
+
+
+# Obtener varios retos por ID con una sola consulta $in (evita el N+1 de GET /retos/{id})
+async def get_retos_by_ids(ids: List[str], fields: Optional[tuple] = None) -> dict:
+    """
+    Devuelve un item por id pedido, en el mismo orden, con found=False para los
+    que no existen. Los ids inválidos se rechazan antes de consultar la BD.
+    """
+    if not ids:
+        raise HTTPException(status_code=400, detail="Debe indicar al menos un id")
+    if len(ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"Máximo {MAX_BATCH_IDS} ids por petición")
+    # Mismo tratamiento de ids que get_reto_by_id: el primero inválido responde 400
+    object_ids = {i: _reto_object_id(i) for i in ids}
+
+    try:
+        cursor = retos_coll().find({"_id": {"$in": list(set(object_ids.values()))}}, projection_for(fields))
+        serializar = serializer_for(Retos, fields)
+        encontrados = {doc["_id"]: serializar(doc) async for doc in cursor}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error obteniendo retos: {e}")
+
+    items = []
+    for i in ids:
+        reto = encontrados.get(object_ids[i])
+        items.append({"id": i, "found": reto is not None, "reto": reto})
+    return {"items": items}
+
+
 async def update_reto(reto_id: str, reto_data: dict) -> dict:
     try:
+        reto_oid = _reto_object_id(reto_id)
+
         # Solo campos permitidos
         allowed_fields = {"title", "description", "categoria_id", "activo"}
         update_fields = {k: v for k, v in reto_data.items() if k in allowed_fields and v is not None}
@@ -49,35 +155,78 @@ async def update_reto(reto_id: str, reto_data: dict) -> dict:
         if not update_fields:
             raise HTTPException(status_code=400, detail="No hay campos válidos para actualizar")
 
-        result = await retos_coll.update_one(
-            {"_id": ObjectId(reto_id)},
-            {"$set": update_fields}
-            
-            
+        # Un solo find-and-modify. Se pide el documento previo (lo necesitan los contadores
+        # de categoría) y el nuevo se obtiene aplicándole los mismos $set/$inc, sin releer.
+        # Solo se escribe (y se incrementa version) si algún valor cambia de verdad.
+        anterior = await retos_coll().find_one_and_update(
+            {"_id": reto_oid, "$or": [{campo: {"$ne": valor}} for campo, valor in update_fields.items()]},
+            {"$set": update_fields, "$inc": {"version": 1}},
+            return_document=ReturnDocument.BEFORE
         )
-        
-        print("ID recibido:", reto_id)
-        print("Datos recibidos:", reto_data)
 
+        if anterior is None:
+            # Sin match: o no existe (404) o no hubo cambios
+            actual = await retos_coll().find_one({"_id": reto_oid})
+            if actual is None:
+                raise HTTPException(status_code=404, detail="Reto no encontrado")
+            # Devolver el reto actual, sin tocar version ni los contadores de categoría
+            actual["id"] = str(actual.pop("_id"))
+            return actual
 
-        if result.matched_count == 0:
-            raise HTTPException(status_code=404, detail="Reto no encontrado")
+        # Solo si cambió de verdad la categoría principal se recalcula categoria_ids
+        # (principal + relaciones de Retos_categoria); un PUT normal no paga esas consultas
+        if update_fields.get("categoria_id", anterior.get("categoria_id")) != anterior.get("categoria_id"):
+            update_fields["categoria_ids"] = await categorias_de_reto(reto_id, update_fields["categoria_id"])
+            await retos_coll().update_one(
+                {"_id": reto_oid},
+                {"$set": {"categoria_ids": update_fields["categoria_ids"]}}
+            )
 
-        return await get_reto_by_id(reto_id)
+        await _actualizar_contadores_categoria(reto_id, anterior, update_fields)
+
+        nuevo = {**anterior, **update_fields, "version": (anterior.get("version") or 0) + 1}
+        nuevo["id"] = str(nuevo.pop("_id"))
+        return nuevo
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error actualizando reto: {e}")
 
 
-# Eliminar reto
+async def _actualizar_contadores_categoria(reto_id: str, anterior: dict, cambios: dict) -> None:
+    antes = categoria_ids_de(anterior)
+    despues = cambios.get("categoria_ids", antes)
+    title = cambios.get("title", anterior.get("title"))
+
+    for categoria_id in antes:
+        if categoria_id not in despues:
+            await quitar_reto_de_categoria(categoria_id, reto_id)
+    if title != anterior.get("title"):
+        # Una sola escritura para todas las categorías; solo toca las que lo tienen en la vista previa
+        await renombrar_reto_en_categorias([c for c in antes if c in despues], reto_id, title)
+    for categoria_id in despues:
+        if categoria_id not in antes:
+            await registrar_reto_en_categoria(categoria_id, reto_id, title)
+
+
+# Eliminar reto (solo si está desactivado), en una sola operación condicional
 async def delete_reto(reto_id: str):
     try:
-        reto = await retos_coll.find_one({"_id": ObjectId(reto_id)})
-        if not reto:
-            raise HTTPException(status_code=404, detail="Reto no encontrado")
-        if reto.get("activo", True):
-            raise HTTPException(status_code=400, detail="No se puede eliminar un reto activo")
-        
-        await retos_coll.delete_one({"_id": ObjectId(reto_id)})
+        reto_oid = _reto_object_id(reto_id)
+        reto = await retos_coll().find_one_and_delete(
+            {"_id": reto_oid, "activo": False},
+            projection={"categoria_id": 1, "categoria_ids": 1}
+        )
+        if reto is None:
+            # Solo en el caso de error: distinguir "no existe" de "sigue activo"
+            if await retos_coll().count_documents({"_id": reto_oid}, limit=1) == 0:
+                raise HTTPException(status_code=404, detail="Reto no encontrado")
+            raise HTTPException(status_code=400, detail="Primero desactiva el reto antes de eliminarlo")
+
+        for categoria_id in categoria_ids_de(reto):
+            await quitar_reto_de_categoria(categoria_id, reto_id)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error eliminando reto: {e}")
 
@@ -85,7 +234,7 @@ async def delete_reto(reto_id: str):
 # Listar retos por usuario
 async def get_ret_os_by_usuario(usuario_id: str) -> List[dict]:
     try:
-        cursor = retos_coll.find({"usuario_id": usuario_id})
+        cursor = retos_coll().find({"usuario_id": usuario_id})
         retos = []
         async for doc in cursor:
             doc["id"] = str(doc["_id"])
@@ -94,18 +243,44 @@ async def get_ret_os_by_usuario(usuario_id: str) -> List[dict]:
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error listando retos: {e}")
 
-# Listar retos con filtros
+# Listar retos con filtros (paginación por cursor sobre _id)
 async def listar_retos(usuario_id: Optional[str] = None,
-                       categoria_id: Optional[str] = None) -> List[Retos]:
+                       categoria_id: Optional[str] = None,
+                       limit: int = DEFAULT_PAGE_SIZE,
+                       cursor: Optional[str] = None,
+                       fields: Optional[tuple] = None) -> dict:
     filtro = {}
     if usuario_id:
         filtro["usuario_id"] = usuario_id
     if categoria_id:
-        filtro["categoria_id"] = categoria_id
-
-    cursor = retos_coll.find(filtro)
-    retos = []
-    async for doc in cursor:
-        doc["id"] = str(doc["_id"])
-        retos.append(Retos(**doc))
-    return retos
+        # Índice multikey "categoria_ids_id": incluye las categorías de Retos_categoria
+        filtro.update(filtro_retos_de_categoria(categoria_id))
+    if cursor:
+        filtro["_id"] = {"$gt": decode_cursor(cursor)}
+
+    # Se pide un documento extra para saber si existe una página siguiente
+    cursor_db = retos_coll().find(filtro, projection_for(fields)).sort("_id", 1).limit(limit + 1)
+    docs = await cursor_db.to_list(length=limit + 1)
+    hay_mas = len(docs) > limit
+    docs = docs[:limit]
+
+    return {
+        "items": serializer_for(Retos, fields).many(docs),
+        "next_cursor": encode_cursor(docs[-1]["_id"]) if hay_mas else None
+    }
+
+
+# Exportar retos en streaming (sin cargar el resultado completo en memoria)
+async def stream_retos(usuario_id: Optional[str] = None,
+                       categoria_id: Optional[str] = None,
+                       batch_size: int = STREAM_BATCH_SIZE,
+                       fields: Optional[tuple] = None):
+    filtro = {}
+    if usuario_id:
+        filtro["usuario_id"] = usuario_id
+    if categoria_id:
+        filtro.update(filtro_retos_de_categoria(categoria_id))
+
+    serializar = serializer_for(Retos, fields)
+    async for doc in retos_coll().find(filtro, projection_for(fields)).sort("_id", 1).batch_size(batch_size):
+        yield serializar(doc)
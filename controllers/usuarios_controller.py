@@ -1,19 +1,21 @@
 import firebase_admin
 import logging
 import os
-import requests
+import httpx
 import base64
 import json
 
-from models.login import Login
+from models.login import Login, RefreshRequest
 from models.usuarios import Usuario
 
-from utils.mongodb import get_collection
-from utils.security import create_jwt_token
+from utils.mongodb import get_async_collection
+from utils.security import create_jwt_token, create_refresh_token, decode_refresh_token
+from utils.revocation import start_session, rotate_refresh_token, revoke_family
+from utils.http_client import FIREBASE_AUTH_URL, post_json
+from utils.executor import firebase_executor
+from utils.cache import get_cache, subscribe
 
 from firebase_admin import credentials, auth as firebase_auth
-from pymongo.server_api import ServerApi
-from pymongo import MongoClient
 from fastapi import HTTPException
 from dotenv import load_dotenv
 
@@ -25,6 +27,41 @@ MONGO_URI = os.getenv("MONGODB_URI")
 MONGO_DB_NAME = os.getenv("DATABASE_NAME")
 USER_COLLECTION = os.getenv("USER_COLLECTION")
 
+# Solo los campos necesarios para emitir el token
+PROYECCION_PERFIL = {"name": 1, "lastname": 1, "email": 1, "active": 1, "admin": 1}
+
+# Caché de perfiles por email para /login y /refresh
+perfiles_cache = get_cache(
+    "perfiles",
+    maxsize=int(os.getenv("PERFILES_CACHE_MAXSIZE", "10000")),
+    ttl=float(os.getenv("PERFILES_CACHE_TTL_S", "300"))
+)
+
+
+def invalidar_perfil(email: str = None) -> None:
+    if email:
+        perfiles_cache.invalidate(email)
+    else:
+        perfiles_cache.clear()
+
+
+def _on_usuario_change(usuario_id: str = None) -> None:
+    # Los eventos del change stream traen el _id, no el email: se vacía la caché (escrituras poco frecuentes)
+    perfiles_cache.clear()
+
+
+subscribe(USER_COLLECTION, _on_usuario_change)
+
+
+async def get_perfil(email: str) -> dict:
+    """Perfil del usuario para emitir tokens, desde caché o con una lectura proyectada"""
+    perfil = perfiles_cache.get(email)
+    if perfil is None:
+        perfil = await get_async_collection(USER_COLLECTION).find_one({"email": email}, PROYECCION_PERFIL)
+        if perfil:
+            perfiles_cache.set(email, perfil)
+    return perfil
+
 
 def initialize_firebase():
     """Inicializa Firebase usando base64 o archivo local"""
@@ -52,13 +89,15 @@ def initialize_firebase():
 
 
 async def create_user(user: Usuario) -> Usuario:
-    initialize_firebase()
     user_record = {}
     try:
-        user_record = firebase_auth.create_user(
+        user_record = await firebase_executor.run(
+            firebase_auth.create_user,
             email=user.email,
             password=user.password
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("Error creando el usuario en firebase")
         raise HTTPException(
@@ -67,7 +106,7 @@ async def create_user(user: Usuario) -> Usuario:
         )
 
     try:
-        coll = get_collection(USER_COLLECTION)
+        coll = get_async_collection(USER_COLLECTION)
         user_dict = {
             "name": user.name,
             "lastname": user.lastname,
@@ -76,7 +115,8 @@ async def create_user(user: Usuario) -> Usuario:
             "admin": user.admin
         }
         
-        inserted = coll.insert_one(user_dict)
+        inserted = await coll.insert_one(user_dict)
+        invalidar_perfil(user.email)
 
         new_user = Usuario(
             id=str(inserted.inserted_id),
@@ -90,22 +130,29 @@ async def create_user(user: Usuario) -> Usuario:
         return new_user
 
     except Exception as e:
-        firebase_auth.delete_user(user_record.uid)
+        await firebase_executor.run(firebase_auth.delete_user, user_record.uid)
         logger.error(f"Error creando usuario: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error en base de datos: {str(e)}")
 
 
 async def login(user: Login) -> dict:
     api_key = os.getenv("FIREBASE_API_KEY")
-    url = f"https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword?key={api_key}"
+    url = f"{FIREBASE_AUTH_URL}/accounts:signInWithPassword"
     payload = {
         "email": user.email,
         "password": user.password,
         "returnSecureToken": True
     }
 
-    response = requests.post(url, json=payload)
-    response_data = response.json()
+    try:
+        response = await post_json(url, payload, params={"key": api_key})
+        response_data = response.json()
+    except (httpx.HTTPError, ValueError) as e:
+        logger.error(f"Error contactando Firebase: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="Servicio de autenticación no disponible"
+        )
 
     if "error" in response_data:
         raise HTTPException(
@@ -113,8 +160,7 @@ async def login(user: Login) -> dict:
             detail="Error al autenticar usuario"
         )
 
-    coll = get_collection(USER_COLLECTION)
-    user_info = coll.find_one({"email": user.email})
+    user_info = await get_perfil(user.email)
 
     if not user_info:
         raise HTTPException(
@@ -122,14 +168,64 @@ async def login(user: Login) -> dict:
             detail="Usuario no encontrado en la base de datos"
         )
 
+    claims = (
+        user_info["name"],
+        user_info["lastname"],
+        user_info["email"],
+        user_info["active"],
+        user_info["admin"],
+        str(user_info["_id"])
+    )
+    refresh_token = create_refresh_token(*claims)
+    nuevo = decode_refresh_token(refresh_token)
+    await start_session(nuevo["fam"], nuevo["jti"], nuevo["exp"])
     return {
         "message": "Usuario Autenticado correctamente",
-        "idToken": create_jwt_token(
-            user_info["name"],
-            user_info["lastname"],
-            user_info["email"],
-            user_info["active"],
-            user_info["admin"],
-            str(user_info["_id"])
-        )
+        "idToken": create_jwt_token(*claims),
+        "refreshToken": refresh_token
+    }
+
+
+async def refresh_session(body: RefreshRequest) -> dict:
+    """
+    Emite un nuevo token de acceso a partir de un refresh token, sin Firebase.
+    active/admin se toman del perfil actual (caché de perfiles), no de los claims
+    congelados en el refresh token: un usuario desactivado pierde la sesión.
+    El refresh token se rota: cada uno sirve una sola vez y, si se reutiliza uno
+    ya rotado, se revoca toda la sesión.
+    """
+    payload = decode_refresh_token(body.refresh_token)
+
+    perfil = await get_perfil(payload["email"])
+    if not perfil or not perfil.get("active"):
+        await revoke_family(payload["fam"])
+        raise HTTPException(status_code=401, detail="Inactive user")
+
+    claims = (
+        perfil["name"],
+        perfil["lastname"],
+        perfil["email"],
+        perfil["active"],
+        perfil["admin"],
+        str(perfil["_id"])
+    )
+    refresh_token = create_refresh_token(*claims, family=payload["fam"])
+    nuevo = decode_refresh_token(refresh_token)
+
+    # Una sola escritura: solo rota si el token presentado es el vigente de la sesión
+    if not await rotate_refresh_token(payload["fam"], payload["jti"], nuevo["jti"], nuevo["exp"]):
+        logger.warning(f"Refresh token reutilizado o sesión revocada para {payload.get('email')}")
+        raise HTTPException(status_code=401, detail="Sesión revocada")
+
+    return {
+        "message": "Token renovado correctamente",
+        "idToken": create_jwt_token(*claims),
+        "refreshToken": refresh_token
     }
+
+
+async def logout(body: RefreshRequest) -> dict:
+    """Revoca la sesión del refresh token (y todos sus sucesores)."""
+    payload = decode_refresh_token(body.refresh_token)
+    await revoke_family(payload["fam"])
+    return {"message": "Sesión cerrada correctamente"}
@@ -1,6 +1,7 @@
 import os
 import logging
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
@@ -11,20 +12,60 @@ load_dotenv()
 URI = os.getenv("MONGODB_URI")
 
 # --- 2. Importar tus módulos (rutas, controladores, etc.) ---
-from models.login import Login
+from models.login import Login, RefreshRequest
+from utils.mongodb import connect_async_client, close_async_client, ping_database
+from utils.http_client import get_http_client, close_http_client
+from utils.executor import firebase_executor
+from utils.cache import cache_stats
+from utils.pubsub import comentarios_hub
+from controllers.comentarios_controller import comentarios_writer, COMENTARIOS_BATCH_WRITES
+from utils.change_streams import change_listener, CHANGE_STREAMS_ENABLED
 from utils.security import validateuser, validateadmin
-from controllers.usuarios_controller import login
+from controllers.usuarios_controller import login, initialize_firebase, refresh_session, logout
+from utils.indexes import index_bootstrap
 from routes.Participaciones import router as participaciones_router
 from routes.retos import router as retos_router
 from routes.comentarios import router as comentarios_router
 from routes.categorias import router as categorias_router
 from routes.Usuario import router as usuario_router
+from routes.Retos_categoria import router as retos_categoria_router
 
 # --- 3. Inicializar la aplicación FastAPI ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Un único pool de conexiones a MongoDB por proceso (worker)
+    connect_async_client()
+    try:
+        await ping_database()
+    except Exception as e:
+        logging.warning(f"MongoDB no respondió al ping inicial: {e}")
+    # Los índices se aplican en segundo plano y se reintentan hasta que existen todos
+    index_bootstrap.start()
+    get_http_client()
+    # Firebase Admin se inicializa una sola vez, fuera del camino de las peticiones
+    try:
+        await firebase_executor.run(initialize_firebase)
+    except Exception as e:
+        logging.error(f"No se pudo inicializar Firebase: {e}")
+    if CHANGE_STREAMS_ENABLED:
+        change_listener.start()
+    if COMENTARIOS_BATCH_WRITES:
+        comentarios_writer.start()
+    try:
+        yield
+    finally:
+        # Primero se vacía la cola de comentarios pendientes, luego se cierran las conexiones
+        await comentarios_writer.stop()
+        await change_listener.stop()
+        await index_bootstrap.stop()
+        await close_http_client()
+        close_async_client()
+
 app = FastAPI(
     title="Altus API",
     description="API para la plataforma de retos Altus.",
-    version="1.0.1"
+    version="1.0.1",
+    lifespan=lifespan
 )
 
 # --- 4. Configurar CORS (¡ESTA ES LA CORRECCIÓN PRINCIPAL!) ---
@@ -59,6 +100,14 @@ def read_root():
 async def login_access(l: Login) -> dict:
     return await login(l)
 
+@app.post("/refresh", tags=["Authentication"])
+async def refresh_access(body: RefreshRequest) -> dict:
+    return await refresh_session(body)
+
+@app.post("/logout", tags=["Authentication"])
+async def logout_access(body: RefreshRequest) -> dict:
+    return await logout(body)
+
 # --- 6. Incluir los routers de otros módulos ---
 # Es buena práctica agrupar rutas con prefijos y etiquetas para la documentación
 app.include_router(participaciones_router, prefix="/api/v1", tags=["Participaciones"])
@@ -66,22 +115,38 @@ app.include_router(retos_router, prefix="/api/v1", tags=["Retos"])
 app.include_router(categorias_router, prefix="/api/v1", tags=["Categorías"])
 app.include_router(usuario_router, prefix="/api/v1", tags=["Usuarios"])
 app.include_router(comentarios_router, prefix="/api/v1", tags=["Comentarios"])
+app.include_router(retos_categoria_router, prefix="/api/v1", tags=["Retos-Categorías"])
 
 # --- 7. Endpoints de monitoreo (Health & Readiness) ---
 @app.get("/health", tags=["Monitoring"])
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", tags=["Monitoring"])
+def metrics():
+    return {
+        "firebase_executor": firebase_executor.stats(),
+        "caches": cache_stats(),
+        "change_streams": change_listener.stats(),
+        "indexes": index_bootstrap.stats(),
+        "comentarios_sse": comentarios_hub.stats(),
+        "comentarios_batch_writer": comentarios_writer.stats()
+    }
+
 @app.get("/ready", tags=["Monitoring"])
-def readiness_check():
+async def readiness_check():
     try:
-        # Aquí deberías tener una función que verifique la conexión a la BD
-        # from utils.mongodb import test_connection
-        # test_connection()
-        return {"status": "ready", "dependencies": {"database": "connected"}}
+        await ping_database()
     except Exception as e:
         logging.error(f"Readiness check failed: {e}")
         return {"status": "not_ready", "error": str(e)}
+    if not index_bootstrap.ready:
+        return {
+            "status": "not_ready",
+            "dependencies": {"database": "connected", "indexes": "pending"},
+            "error": f"Índices pendientes en {index_bootstrap.pendientes}"
+        }
+    return {"status": "ready", "dependencies": {"database": "connected", "indexes": "ok"}}
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
\ No newline at end of file
@@ -26,10 +26,10 @@ class Categoria(BaseModel):
     )
     
 class RetoOut(BaseModel):
-    name: str
-    puntos: int
+    id: str
+    title: str
 
 class CategoriaConRetos(Categoria):
-    total_retos: int
-    retos: List[RetoOut]
+    total_retos: int = Field(default=0, description="Cantidad de retos de la categoría")
+    retos: List[RetoOut] = Field(default_factory=list, description="Vista previa de los retos más recientes")
     
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, List
 import re
 
 class comentarios(BaseModel):
@@ -23,4 +23,10 @@ class comentarios(BaseModel):
     usuario_id: str = Field(
         description="ID del usuario que creó el comentario",
         examples=["usuario_123"]
-    )
\ No newline at end of file
+    )
+
+
+class ComentariosPagina(BaseModel):
+    items: List[comentarios] = Field(default_factory=list, description="Comentarios, del más reciente al más antiguo")
+    next_before: Optional[str] = Field(default=None, description="Valor de 'before' para la siguiente página; null si no hay más")
+    total: int = Field(default=0, description="Total de comentarios del reto")
@@ -0,0 +1,52 @@
+import os
+from dotenv import load_dotenv
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from pymongo.collation import Collation, CollationStrength
+
+load_dotenv()
+
+USER_COLLECTION = os.getenv("USER_COLLECTION")
+
+# Registro declarativo de índices por colección.
+# Se aplica de forma idempotente al arrancar la app, con reintentos hasta que existen
+# todos (utils/indexes.index_bootstrap; /ready no responde "ready" mientras falte alguno)
+# y se puede comparar contra la BD con:  python -m utils.indexes diff
+INDEXES = {
+    "Categorias": [
+        # Nombre único sin distinguir mayúsculas/minúsculas (collation es, strength 2)
+        IndexModel(
+            [("name", ASCENDING)],
+            name="name_ci_unique",
+            unique=True,
+            collation=Collation(locale="es", strength=CollationStrength.SECONDARY)
+        ),
+    ],
+    "Retos": [
+        IndexModel([("usuario_id", ASCENDING), ("_id", ASCENDING)], name="usuario_id_id"),
+        IndexModel([("categoria_id", ASCENDING), ("_id", ASCENDING)], name="categoria_id_id"),
+        # Multikey: categoría principal + relaciones de Retos_categoria (ver controllers/Retos_categoria.py)
+        IndexModel([("categoria_ids", ASCENDING), ("_id", ASCENDING)], name="categoria_ids_id"),
+    ],
+    "Comentarios": [
+        # Feed por reto, más recientes primero (y conteo por reto)
+        IndexModel([("reto_id", ASCENDING), ("_id", DESCENDING)], name="reto_id_id_desc"),
+    ],
+    "Participaciones": [
+        # Un usuario solo puede inscribirse una vez por reto
+        IndexModel([("usuario_id", ASCENDING), ("reto_id", ASCENDING)], name="usuario_reto_unique", unique=True),
+        # Conteo de participaciones por reto (detalle del reto)
+        IndexModel([("reto_id", ASCENDING)], name="reto_id"),
+    ],
+    "RefreshSessions": [
+        # Las sesiones se borran solas cuando su último refresh token ya habría expirado
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "Retos_categoria": [
+        IndexModel([("reto_id", ASCENDING), ("categoria_id", ASCENDING)], name="reto_categoria_unique", unique=True),
+    ],
+}
+
+if USER_COLLECTION:
+    INDEXES[USER_COLLECTION] = [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ]
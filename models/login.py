@@ -32,3 +32,10 @@ class Login(BaseModel):
         if not re.search(r"[!@#$%^&*(),.?\":{}|<>]", value):
             raise ValueError("Debe contener un carácter especial")
         return value
+
+
+class RefreshRequest(BaseModel):
+    refresh_token: str = Field(
+        min_length=1,
+        description="Refresh token recibido en /login o en el último /refresh"
+    )
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, List
+from models.comentarios import comentarios
 
 class Retos(BaseModel):
     id: Optional[str] = Field(default=None, description="MongoDB ID - Se genera automáticamente al crear el reto")
@@ -7,4 +8,47 @@ class Retos(BaseModel):
     usuario_id: str = Field(..., description="ID del usuario que creó el reto")
     description: str = Field(..., min_length=20, max_length=500, description="Descripción detallada del reto")
     categoria_id: str = Field(..., description="ID de la categoría a la que pertenece el reto")
+    categoria_ids: List[str] = Field(default_factory=list, description="Categoría principal más las asignadas en /retos-categorias (solo lectura)")
     activo: bool = Field(default=True, description="Estado activo/inactivo del reto")  # ✅ nuevo campo
+
+
+class RetosPagina(BaseModel):
+    items: List[Retos] = Field(default_factory=list, description="Retos de la página actual")
+    next_cursor: Optional[str] = Field(default=None, description="Cursor para pedir la siguiente página; null si no hay más")
+
+
+class RetosBatchRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, description="IDs de los retos a obtener, en el orden deseado")
+    fields: Optional[List[str]] = Field(default=None, description="Campos a devolver; id siempre se incluye")
+
+
+class RetoLoteItem(BaseModel):
+    id: str = Field(..., description="ID pedido")
+    found: bool = Field(..., description="False si el reto no existe")
+    reto: Optional[Retos] = Field(default=None, description="El reto, o null si no se encontró")
+
+
+class RetosLote(BaseModel):
+    items: List[RetoLoteItem] = Field(default_factory=list, description="Un item por id pedido, en el mismo orden")
+
+
+class ComentariosDetalle(BaseModel):
+    items: List[comentarios] = Field(default_factory=list, description="Primera página de comentarios, del más reciente al más antiguo")
+    next_before: Optional[str] = Field(default=None, description="Valor de 'before' para GET /comentarios/reto/{id}; null si no hay más")
+
+
+class ConteosReto(BaseModel):
+    comentarios: int = Field(default=0, description="Total de comentarios del reto")
+    participaciones: int = Field(default=0, description="Total de participaciones en el reto")
+
+
+class CategoriaDeReto(BaseModel):
+    id: str
+    name: str
+
+
+class RetoDetalle(BaseModel):
+    reto: Retos
+    comentarios: Optional[ComentariosDetalle] = Field(default=None, description="Solo si comentarios=true")
+    conteos: Optional[ConteosReto] = Field(default=None, description="Solo si conteos=true")
+    categorias: Optional[List[CategoriaDeReto]] = Field(default=None, description="Solo si categorias=true")
@@ -1,29 +1,36 @@
 from bson import ObjectId
 
-def pipeline_categorias_con_retos():
+def pipeline_contadores_categorias(preview_size: int) -> list:
+    """
+    Recalcula desde cero, por categoría, el total de retos y la vista previa
+    de los más recientes (usado por el job de reparación de contadores).
+    """
     return [
         {
-            "$lookup": {
-                "from": "retos",
-                "localField": "_id",
-                "foreignField": "id_categoria",
-                "as": "retos"
-            }
+            "$sort": {"_id": -1}
         },
+        # Un reto cuenta en todas sus categorías: categoria_id más las de categoria_ids
         {
             "$project": {
-                "id": {"$toString": "$_id"},
-                "name": 1,
-                "text": 1,
-                "total_retos": {"$size": "$retos"},
+                "title": 1,
+                "categoria": {"$setUnion": [{"$ifNull": ["$categoria_ids", []]}, ["$categoria_id"]]}
+            }
+        },
+        {
+            "$unwind": "$categoria"
+        },
+        {
+            "$group": {
+                "_id": "$categoria",
+                "total_retos": {"$sum": 1},
+                # $firstN mantiene acotada la memoria del grupo (MongoDB >= 5.2)
                 "retos": {
-                    "$map": {
-                        "input": "$retos",
-                        "as": "reto",
-                        "in": {
-                            "name": "$$reto.name",
-                            "puntos": "$$reto.puntos"
-                        }
+                    "$firstN": {
+                        "input": {
+                            "id": {"$toString": "$_id"},
+                            "title": "$title"
+                        },
+                        "n": preview_size
                     }
                 }
             }
@@ -52,29 +59,3 @@ def pipeline_estadisticas_categoria(categoria_id: str) -> list:
             }
         }
     ]
-    
-    
-
-def pipeline_validar_eliminacion_categoria(categoria_id: str) -> list:
-    return [
-        {
-            "$match": {
-                "_id": ObjectId(categoria_id)
-            }
-        },
-        {
-            "$lookup": {
-                "from": "retos",
-                "localField": "_id",
-                "foreignField": "id_categoria",
-                "as": "retos"
-            }
-        },
-        {
-            "$project": {
-                "id": {"$toString": "$_id"},
-                "name": 1,
-                "cantidad_retos": {"$size": "$retos"}
-            }
-        }
-    ]
\ No newline at end of file
@@ -0,0 +1,81 @@
+from bson import ObjectId
+
+
+def _lookup_conteo(coleccion: str, reto_id: str) -> list:
+    # Subconsulta no correlacionada: Mongo la resuelve una vez y usa el índice por reto_id
+    return [
+        {"$lookup": {"from": coleccion, "pipeline": [{"$match": {"reto_id": reto_id}}, {"$count": "n"}], "as": "c"}},
+        {"$project": {"_id": 0, "n": {"$ifNull": [{"$arrayElemAt": ["$c.n", 0]}, 0]}}}
+    ]
+
+
+def pipeline_detalle_reto(reto_id: str,
+                          comentarios_limit: int,
+                          proyeccion_comentario: dict,
+                          comentarios: bool = True,
+                          conteos: bool = True,
+                          categorias: bool = True) -> list:
+    """
+    Detalle completo de un reto en una sola agregación sobre Retos: el $facet arma
+    cada sección pedida a partir del reto encontrado. Si el reto no existe todas las
+    secciones salen vacías y no se consulta ninguna otra colección.
+    """
+    facetas = {"reto": [{"$project": {"version": 0}}]}
+
+    if comentarios:
+        # Se pide uno de más para saber si hay una página siguiente
+        facetas["comentarios"] = [
+            {"$lookup": {
+                "from": "Comentarios",
+                "pipeline": [
+                    {"$match": {"reto_id": reto_id}},
+                    {"$sort": {"_id": -1}},
+                    {"$limit": comentarios_limit + 1},
+                    {"$project": proyeccion_comentario}
+                ],
+                "as": "items"
+            }},
+            {"$project": {"_id": 0, "items": 1}}
+        ]
+
+    if conteos:
+        facetas["total_comentarios"] = _lookup_conteo("Comentarios", reto_id)
+        facetas["total_participaciones"] = _lookup_conteo("Participaciones", reto_id)
+
+    if categorias:
+        # Las categorías ya están en el propio reto (categoria_ids, multikey); los retos
+        # sin backfill caen a su categoria_id. Se buscan por _id, sin pasar por Retos_categoria.
+        facetas["categorias"] = [
+            {"$lookup": {
+                "from": "Categorias",
+                "let": {"ids": {"$map": {
+                    "input": {"$ifNull": ["$categoria_ids", ["$categoria_id"]]},
+                    "as": "cid",
+                    "in": {"$convert": {"input": "$$cid", "to": "objectId", "onError": None, "onNull": None}}
+                }}},
+                "pipeline": [
+                    {"$match": {"$expr": {"$in": ["$_id", "$$ids"]}}},
+                    {"$project": {"_id": 0, "id": {"$toString": "$_id"}, "name": 1}}
+                ],
+                "as": "items"
+            }},
+            {"$project": {"_id": 0, "items": 1}}
+        ]
+
+    return [
+        {"$match": {"_id": ObjectId(reto_id)}},
+        {"$limit": 1},
+        {"$facet": facetas}
+    ]
+
+
+def pipeline_categorias_por_reto() -> list:
+    """Categorías de cada reto según Retos_categoria (usado por el backfill de categoria_ids)."""
+    return [
+        {
+            "$group": {
+                "_id": "$reto_id",
+                "categoria_ids": {"$addToSet": "$categoria_id"}
+            }
+        }
+    ]
@@ -1,15 +1,24 @@
-from fastapi import APIRouter, HTTPException, Request,Depends
-from models.categorias import Categoria
+from fastapi import APIRouter, HTTPException, Request, Depends, Query, Response
+from models.categorias import Categoria, CategoriaConRetos
 from utils.security import validate_token
 from motor.motor_asyncio import AsyncIOMotorClient
 from controllers.categorias_controller import (
     create_categoria,
     get_categorias,
+    stream_categorias,
     get_categoria_by_id,
     update_categoria,
     deactivate_categoria
 )
 from utils.security import validateadmin
+from utils.cache import bypass_cache
+from utils.serialization import DocSerializer, fast_json_response, parse_fields, serializer_for
+from utils.etag import etag_from_version, etag_from_versions, is_not_modified, not_modified_response
+from utils.streaming import STREAM_BATCH_SIZE, MAX_STREAM_BATCH_SIZE, wants_ndjson, ndjson_response
+
+serializar_categoria = DocSerializer(CategoriaConRetos)
+
+CAMPOS_CATEGORIA = "Campos a devolver separados por coma (p. ej. name); id siempre se incluye"
 
 router = APIRouter(
     prefix="/categorias",
@@ -25,15 +34,40 @@ async def create_categoria_endpoint(
     return await create_categoria(categoria)
 
 
-@router.get("/", response_model=list[Categoria])
-async def get_categorias_endpoint(request: Request) -> dict:
-    """Obtener todas las categorías"""
-    return await get_categorias()
+@router.get("/", response_model=list[CategoriaConRetos])
+async def get_categorias_endpoint(
+    request: Request,
+    batch_size: int = Query(STREAM_BATCH_SIZE, ge=1, le=MAX_STREAM_BATCH_SIZE),
+    fields: str = Query(None, description=CAMPOS_CATEGORIA)
+) -> dict:
+    """Obtener todas las categorías (en NDJSON si se pide Accept: application/x-ndjson)"""
+    campos = parse_fields(CategoriaConRetos, fields)
+    if wants_ndjson(request):
+        return ndjson_response(stream_categorias(batch_size, campos), batch_size)
+    categorias = await get_categorias(use_cache=not bypass_cache(request), fields=campos)
+    etag = etag_from_versions(categorias, campos)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    serializar = serializer_for(CategoriaConRetos, campos) if campos else serializar_categoria
+    return fast_json_response(serializar.many(categorias), headers={"ETag": etag})
 
-@router.get("/{categoria_id}", response_model=Categoria, tags=["categorías"])
-async def get_categoria_id_endpoint(categoria_id: str) -> Categoria:
+@router.get("/{categoria_id}", response_model=CategoriaConRetos, tags=["categorías"])
+async def get_categoria_id_endpoint(
+    request: Request,
+    response: Response,
+    categoria_id: str,
+    fields: str = Query(None, description=CAMPOS_CATEGORIA)
+) -> CategoriaConRetos:
     """Obtener una categoría por ID"""
-    return await get_categoria_by_id(categoria_id)
+    campos = parse_fields(CategoriaConRetos, fields)
+    categoria = await get_categoria_by_id(categoria_id, use_cache=not bypass_cache(request), fields=campos)
+    etag = etag_from_version(categoria["id"], categoria.get("version"), campos)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    if campos:
+        return fast_json_response(serializer_for(CategoriaConRetos, campos)(categoria), headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return categoria
 
 @router.put("/{categoria_id}", response_model=Categoria, tags=["categorías"])
 @validateadmin
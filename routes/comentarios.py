@@ -1,5 +1,10 @@
-from fastapi import APIRouter, HTTPException, Request, Depends
-from models.comentarios import comentarios
+from fastapi import APIRouter, HTTPException, Request, Depends, Query
+from typing import Optional
+from models.comentarios import comentarios, ComentariosPagina
+from fastapi.responses import StreamingResponse
+from utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from utils.pubsub import comentarios_hub, sse_events
+from utils.serialization import fast_json_response
 from controllers.comentarios_controller import (
     create_comentario,
     get_comentarios_de_reto,
@@ -15,9 +20,22 @@ router = APIRouter(
 async def crear_comentario(comentario: comentarios):
     return await create_comentario(comentario)
 
-@router.get("/reto/{reto_id}", response_model=list[comentarios])
-async def obtener_comentarios_de_reto(reto_id: str):
-    return await get_comentarios_de_reto(reto_id)         
+@router.get("/reto/{reto_id}", response_model=ComentariosPagina)
+async def obtener_comentarios_de_reto(
+    reto_id: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = Query(None, description="next_before devuelto por la página anterior")
+):
+    return fast_json_response(await get_comentarios_de_reto(reto_id, limit, before))
+
+@router.get("/reto/{reto_id}/stream")
+async def stream_comentarios_de_reto(reto_id: str, request: Request):
+    """Comentarios nuevos y eliminados del reto en vivo (Server-Sent Events)"""
+    return StreamingResponse(
+        sse_events(comentarios_hub, reto_id, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.delete("/{comentario_id}", response_model=dict)
 async def eliminar_comentario(comentario_id: str):
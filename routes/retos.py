@@ -1,14 +1,23 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
-from models.retos import Retos
-from typing import Optional, List
+from fastapi import APIRouter, Depends, Query, HTTPException, Request
+from models.retos import Retos, RetosPagina, RetosBatchRequest, RetosLote, RetoDetalle
+from typing import Optional
 from controllers.retos_controller import (
     create_reto,
     get_reto_by_id,
+    get_retos_by_ids,
+    get_reto_detalle,
     update_reto,
     delete_reto,
-    listar_retos
+    listar_retos,
+    stream_retos,
+    serializar_reto,
+    DETALLE_COMENTARIOS
 )
 from utils.security import validate_token
+from utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from utils.streaming import STREAM_BATCH_SIZE, MAX_STREAM_BATCH_SIZE, wants_ndjson, ndjson_response
+from utils.serialization import fast_json_response, parse_fields, serializer_for
+from utils.etag import etag_from_version, is_not_modified, not_modified_response
 from pydantic import BaseModel
 
 router = APIRouter(
@@ -16,6 +25,8 @@ router = APIRouter(
     tags=["retos"]
 )
 
+CAMPOS_RETO = "Campos a devolver separados por coma (p. ej. title,activo); id siempre se incluye"
+
 # Modelo para actualización parcial
 class RetoUpdateParcial(BaseModel):
     activo: Optional[bool] = None
@@ -29,45 +40,73 @@ async def post_reto(
     reto.usuario_id = user["id"]
     return await create_reto(reto)
 
-# GET /retos/{id}
-@router.get("/{id}")
-async def get_reto(id: str):
-    reto = await get_reto_by_id(id)
+# POST /retos/batch - multi-get por ids en el cuerpo (listas largas)
+@router.post("/batch", response_model=RetosLote)
+async def post_retos_batch(body: RetosBatchRequest):
+    campos = parse_fields(Retos, ",".join(body.fields)) if body.fields else None
+    return fast_json_response(await get_retos_by_ids(body.ids, campos))
+
+# GET /retos/{id}/detail - reto, comentarios, conteos y categorías en una sola consulta
+@router.get("/{id}/detail", response_model=RetoDetalle)
+async def get_reto_detail(
+    id: str,
+    comentarios: bool = Query(True, description="Incluir la primera página de comentarios"),
+    comentarios_limit: int = Query(DETALLE_COMENTARIOS, ge=1, le=MAX_PAGE_SIZE),
+    conteos: bool = Query(True, description="Incluir totales de comentarios y participaciones"),
+    categorias: bool = Query(True, description="Incluir las categorías del reto")
+):
+    return fast_json_response(
+        await get_reto_detalle(id, comentarios_limit, comentarios, conteos, categorias)
+    )
+
+# GET /retos/{id} - con ETag (If-None-Match -> 304) y fields opcional
+@router.get("/{id}", response_model=Retos)
+async def get_reto(
+    id: str,
+    request: Request,
+    fields: Optional[str] = Query(None, description=CAMPOS_RETO)
+):
+    campos = parse_fields(Retos, fields)
+    reto = await get_reto_by_id(id, campos)
     if not reto:
         raise HTTPException(status_code=404, detail="Reto no encontrado")
-    return reto
+    etag = etag_from_version(reto["id"], reto.get("version"), campos)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    return fast_json_response(serializer_for(Retos, campos)(reto), headers={"ETag": etag})
 
 # PUT /retos/{id} - actualización completa
-@router.put("/{id}")
+@router.put("/{id}", response_model=Retos)
 async def put_reto(id: str, reto: Retos):
-    existente = await get_reto_by_id(id)
-    if not existente:
-        raise HTTPException(status_code=404, detail="Reto no encontrado")
-    return await update_reto(id, reto)
+    return fast_json_response(serializar_reto(await update_reto(id, reto.dict())))
 
 # PATCH /retos/{id} - actualización parcial (activar/desactivar)
-@router.patch("/{id}")
+@router.patch("/{id}", response_model=Retos)
 async def patch_reto(id: str, reto: RetoUpdateParcial):
-    existente = await get_reto_by_id(id)
-    if not existente:
-        raise HTTPException(status_code=404, detail="Reto no encontrado")
-    return await update_reto(id, reto.dict(exclude_unset=True))
+    return fast_json_response(serializar_reto(await update_reto(id, reto.dict(exclude_unset=True))))
 
 # DELETE /retos/{id} - solo si está desactivado
 @router.delete("/{id}")
 async def delete_reto_endpoint(id: str):
-    reto = await get_reto_by_id(id)
-    if not reto:
-        raise HTTPException(status_code=404, detail="Reto no encontrado")
-    if reto.get("activo", True):
-        raise HTTPException(status_code=400, detail="Primero desactiva el reto antes de eliminarlo")
     await delete_reto(id)
     return {"mensaje": "Reto eliminado correctamente"}
 
-# GET /retos - listar
-@router.get("/", response_model=List[Retos])
+# GET /retos - listar (paginado por cursor, o todo en NDJSON con Accept: application/x-ndjson).
+# Con ?ids=a,b,c devuelve esos retos en orden (multi-get, ver RetosLote)
+@router.get("/", response_model=RetosPagina | RetosLote)
 async def get_retos(
+    request: Request,
     usuario_id: Optional[str] = Query(None),
-    categoria_id: Optional[str] = Query(None)
+    categoria_id: Optional[str] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="next_cursor devuelto por la página anterior"),
+    batch_size: int = Query(STREAM_BATCH_SIZE, ge=1, le=MAX_STREAM_BATCH_SIZE, description="Tamaño de lote en modo NDJSON"),
+    fields: Optional[str] = Query(None, description=CAMPOS_RETO),
+    ids: Optional[str] = Query(None, description="IDs separados por coma; devuelve un RetosLote en ese orden")
 ):
-    return await listar_retos(usuario_id, categoria_id)
+    campos = parse_fields(Retos, fields)
+    if ids is not None:
+        return fast_json_response(await get_retos_by_ids([i.strip() for i in ids.split(",") if i.strip()], campos))
+    if wants_ndjson(request):
+        return ndjson_response(stream_retos(usuario_id, categoria_id, batch_size, campos), batch_size)
+    return fast_json_response(await listar_retos(usuario_id, categoria_id, limit, cursor, campos))
@@ -0,0 +1,36 @@
+import time
+
+from utils.cache import TTLCache
+
+
+def test_lru_descarta_la_menos_usada():
+    cache = TTLCache("test", maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None, "La entrada menos usada debió descartarse"
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expira_entradas():
+    cache = TTLCache("test", maxsize=10, ttl=0.01)
+    cache.set("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is None, "La entrada debió expirar"
+
+
+def test_invalidacion_y_estadisticas():
+    cache = TTLCache("test", maxsize=10, ttl=60)
+    cache.set("all", [1])
+    cache.set("id1", {"id": "id1"})
+    cache.get("all")
+    cache.invalidate("all", "no_existe")
+
+    stats = cache.stats()
+    assert cache.get("all") is None
+    assert cache.get("id1") == {"id": "id1"}
+    assert stats["invalidations"] == 1
+    assert stats["hits"] == 1
@@ -0,0 +1,61 @@
+"""
+Contadores y vista previa de retos por categoría contra un mongod local:
+    DB_TESTS=1 MONGODB_URI=mongodb://localhost:27017 pytest test_categorias.py
+"""
+import asyncio
+import os
+import uuid
+
+import pytest
+from bson import ObjectId
+from pymongo.uri_parser import parse_uri
+
+from models.categorias import Categoria
+from models.retos import Retos
+from utils.mongodb import URI, connect_async_client, close_async_client, get_async_collection
+from controllers.categorias_controller import create_categoria, get_categoria_by_id, categorias_coll, PREVIEW_RETOS
+from controllers.retos_controller import create_reto, update_reto, delete_reto
+
+
+def _mongod_local() -> bool:
+    try:
+        return all(host in ("localhost", "127.0.0.1", "::1") for host, _ in parse_uri(URI)["nodelist"])
+    except Exception:
+        return False
+
+
+pytestmark = pytest.mark.skipif(
+    os.getenv("DB_TESTS") != "1" or not _mongod_local(),
+    reason="Requiere DB_TESTS=1 y MONGODB_URI apuntando a un mongod local"
+)
+
+
+async def _borrar_retos_recientes(total: int, borrar: int):
+    connect_async_client()
+    categoria = await create_categoria(Categoria(name=f"test_{uuid.uuid4().hex}", text="Categoría de prueba de la vista previa"))
+    retos = []
+    try:
+        for i in range(total):
+            reto = await create_reto(Retos(
+                title=f"reto {i}", usuario_id="test", description="Reto de prueba de la vista previa",
+                categoria_id=categoria.id
+            ))
+            retos.append(reto.id)
+        for reto_id in reversed(retos[-borrar:]):
+            await update_reto(reto_id, {"activo": False})
+            await delete_reto(reto_id)
+        return retos, await get_categoria_by_id(categoria.id, use_cache=False)
+    finally:
+        await get_async_collection("Retos").delete_many({"categoria_id": categoria.id})
+        await categorias_coll().delete_one({"_id": ObjectId(categoria.id)})
+        close_async_client()
+
+
+def test_vista_previa_se_rellena_al_borrar_retos():
+    total, borrar = PREVIEW_RETOS + 2, PREVIEW_RETOS
+    retos, categoria = asyncio.run(_borrar_retos_recientes(total, borrar))
+
+    restantes = list(reversed(retos[:total - borrar]))
+    assert categoria["total_retos"] == total - borrar
+    assert [r["id"] for r in categoria["retos"]] == restantes, \
+        "La vista previa debe rellenarse con los retos que quedan, del más reciente al más antiguo"
@@ -0,0 +1,64 @@
+"""
+Pruebas del listener de change streams contra un replica set local de un nodo:
+    mongod --replSet rs0 --dbpath /tmp/rs0 && mongosh --eval "rs.initiate()"
+    CHANGE_STREAM_TESTS=1 MONGODB_URI="mongodb://localhost:27017/?replicaSet=rs0" pytest test_change_streams.py
+"""
+import asyncio
+import os
+
+import pytest
+
+from utils.cache import subscribe, unsubscribe
+from utils.change_streams import ChangeStreamListener
+from utils.mongodb import get_async_collection, connect_async_client, close_async_client
+
+pytestmark = pytest.mark.skipif(
+    os.getenv("CHANGE_STREAM_TESTS") != "1",
+    reason="Requiere CHANGE_STREAM_TESTS=1 y un replica set local"
+)
+
+COLECCION = "Categorias"
+
+
+async def _esperar(condicion, timeout: float = 10):
+    fin = asyncio.get_running_loop().time() + timeout
+    while not condicion():
+        if asyncio.get_running_loop().time() > fin:
+            raise TimeoutError("No llegó el evento esperado")
+        await asyncio.sleep(0.05)
+
+
+async def _run():
+    connect_async_client()
+    recibidos = []
+    subscribe(COLECCION, recibidos.append)
+    coll = get_async_collection(COLECCION)
+    try:
+        listener = ChangeStreamListener([COLECCION])
+        listener.start()
+        await _esperar(lambda: listener.running)
+
+        primero = await coll.insert_one({"name": "cs_test_1", "text": "x" * 20})
+        await _esperar(lambda: str(primero.inserted_id) in recibidos)
+        token = listener.resume_token
+        await listener.stop()
+
+        # Cambio mientras el listener está caído: debe llegar al reanudar con el token guardado
+        segundo = await coll.insert_one({"name": "cs_test_2", "text": "x" * 20})
+        reanudado = ChangeStreamListener([COLECCION])
+        reanudado.resume_token = token
+        reanudado.start()
+        await _esperar(lambda: str(segundo.inserted_id) in recibidos)
+        await reanudado.stop()
+
+        await coll.delete_many({"_id": {"$in": [primero.inserted_id, segundo.inserted_id]}})
+        return recibidos
+    finally:
+        # El handler no debe quedar registrado para el resto de la sesión de pytest
+        unsubscribe(COLECCION, recibidos.append)
+        close_async_client()
+
+
+def test_invalidacion_y_reanudacion_con_resume_token():
+    recibidos = asyncio.run(_run())
+    assert len(recibidos) >= 2
@@ -0,0 +1,76 @@
+"""
+Modo de prueba de índices: ejecuta explain() sobre cada consulta de los controladores
+y falla si alguna termina en COLLSCAN.
+
+Se activa con EXPLAIN_TESTS=1 y MONGODB_URI apuntando a un mongod local, p. ej.:
+    EXPLAIN_TESTS=1 MONGODB_URI=mongodb://localhost:27017 pytest test_indexes.py
+"""
+import asyncio
+import os
+
+import pytest
+from bson import ObjectId
+
+from models.indexes import INDEXES, USER_COLLECTION
+from utils.indexes import apply_indexes
+from utils.mongodb import get_async_collection, connect_async_client, close_async_client
+
+explain_mode = pytest.mark.skipif(
+    os.getenv("EXPLAIN_TESTS") != "1",
+    reason="Requiere EXPLAIN_TESTS=1 y un mongod local"
+)
+
+# (colección, filtro, orden) de las consultas que hacen los controladores
+CONSULTAS = [
+    ("Retos", {"_id": ObjectId()}, None),
+    ("Retos", {}, [("_id", 1)]),
+    ("Retos", {"usuario_id": "u"}, [("_id", 1)]),
+    ("Retos", {"categoria_ids": "c"}, [("_id", 1)]),
+    ("Retos", {"$or": [{"categoria_ids": "c"}, {"categoria_id": "c"}]}, [("_id", 1)]),
+    ("Retos", {"usuario_id": "u", "_id": {"$gt": ObjectId()}}, [("_id", 1)]),
+    ("Comentarios", {"reto_id": "r"}, [("_id", -1)]),
+    ("Comentarios", {"reto_id": "r", "_id": {"$lt": ObjectId()}}, [("_id", -1)]),
+    ("Participaciones", {"usuario_id": "u", "reto_id": "r"}, None),
+    ("Participaciones", {"reto_id": "r"}, None),
+    ("Retos_categoria", {"reto_id": "r"}, None),
+    ("Retos_categoria", {"reto_id": "r", "categoria_id": "c"}, None),
+    (USER_COLLECTION, {"email": "a@b.co"}, None),
+]
+
+
+def _stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _stages(item)
+
+
+async def _explain_all():
+    connect_async_client()
+    try:
+        await apply_indexes()
+        planes = []
+        for coleccion, filtro, orden in CONSULTAS:
+            cursor = get_async_collection(coleccion).find(filtro)
+            if orden:
+                cursor = cursor.sort(orden)
+            explain = await cursor.explain()
+            planes.append((coleccion, filtro, set(_stages(explain["queryPlanner"]["winningPlan"]))))
+        return planes
+    finally:
+        close_async_client()
+
+
+def test_registro_cubre_colecciones_consultadas():
+    for coleccion, _, _ in CONSULTAS:
+        assert coleccion in INDEXES, f"La colección {coleccion} no tiene índices declarados"
+
+
+@explain_mode
+def test_consultas_sin_collscan():
+    for coleccion, filtro, stages in asyncio.run(_explain_all()):
+        assert "COLLSCAN" not in stages, f"COLLSCAN en {coleccion} con filtro {filtro}: {stages}"
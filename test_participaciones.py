@@ -0,0 +1,63 @@
+"""
+Prueba de concurrencia de inscripciones contra un mongod local (nunca contra la BD compartida):
+    CONCURRENCY_TESTS=1 MONGODB_URI=mongodb://localhost:27017 pytest test_participaciones.py
+"""
+import asyncio
+import os
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from pymongo.uri_parser import parse_uri
+
+from models.participaciones import Participacion
+from utils.mongodb import URI, connect_async_client, close_async_client
+from utils.indexes import apply_indexes
+from controllers.participaciones_controller import crear_participacion, participaciones_coll
+
+
+def _mongod_local() -> bool:
+    try:
+        return all(host in ("localhost", "127.0.0.1", "::1") for host, _ in parse_uri(URI)["nodelist"])
+    except Exception:
+        return False
+
+
+pytestmark = pytest.mark.skipif(
+    os.getenv("CONCURRENCY_TESTS") != "1" or not _mongod_local(),
+    reason="Requiere CONCURRENCY_TESTS=1 y MONGODB_URI apuntando a un mongod local"
+)
+
+INSCRIPCIONES_CONCURRENTES = 300
+
+
+async def _inscribir_en_paralelo(usuario_id: str, reto_id: str):
+    await apply_indexes(["Participaciones"])
+    intentos = [
+        crear_participacion(Participacion(usuario_id=usuario_id, reto_id=reto_id))
+        for _ in range(INSCRIPCIONES_CONCURRENTES)
+    ]
+    return await asyncio.gather(*intentos, return_exceptions=True)
+
+
+async def _run(usuario_id: str, reto_id: str):
+    connect_async_client()
+    try:
+        resultados = await _inscribir_en_paralelo(usuario_id, reto_id)
+        total = await participaciones_coll().count_documents({"usuario_id": usuario_id, "reto_id": reto_id})
+        await participaciones_coll().delete_many({"usuario_id": usuario_id})
+        return resultados, total
+    finally:
+        close_async_client()
+
+
+def test_inscripcion_concurrente_solo_una_exitosa():
+    usuario_id = f"test_{uuid.uuid4().hex}"
+    resultados, total = asyncio.run(_run(usuario_id, "reto_concurrencia"))
+
+    exitosas = [r for r in resultados if isinstance(r, Participacion)]
+    duplicadas = [r for r in resultados if isinstance(r, HTTPException) and r.status_code == 409]
+
+    assert len(exitosas) == 1, "Solo una inscripción debe tener éxito"
+    assert len(duplicadas) == INSCRIPCIONES_CONCURRENTES - 1, "El resto debe responder 409"
+    assert total == 1, "Debe existir un único documento de participación"
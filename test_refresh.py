@@ -0,0 +1,94 @@
+"""
+Rotación de refresh tokens. Los casos con sesión necesitan un mongod local:
+    DB_TESTS=1 MONGODB_URI=mongodb://localhost:27017 pytest test_refresh.py
+"""
+import asyncio
+import os
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from pymongo.uri_parser import parse_uri
+
+from models.login import RefreshRequest
+from utils.mongodb import URI, connect_async_client, close_async_client, get_async_collection
+from utils.security import create_jwt_token, create_refresh_token, decode_refresh_token, get_principal
+from utils.revocation import start_session, sessions_coll
+from controllers.usuarios_controller import refresh_session, USER_COLLECTION
+
+
+def _mongod_local() -> bool:
+    try:
+        return all(host in ("localhost", "127.0.0.1", "::1") for host, _ in parse_uri(URI)["nodelist"])
+    except Exception:
+        return False
+
+
+requiere_mongod = pytest.mark.skipif(
+    os.getenv("DB_TESTS") != "1" or not _mongod_local(),
+    reason="Requiere DB_TESTS=1 y MONGODB_URI apuntando a un mongod local"
+)
+
+
+def _claims(email: str) -> tuple:
+    return ("Test", "Refresh", email, True, False, uuid.uuid4().hex)
+
+
+async def _refrescar(token: str):
+    try:
+        return await refresh_session(RefreshRequest(refresh_token=token))
+    except HTTPException as e:
+        return e
+
+
+async def _sesion_con_rotaciones():
+    connect_async_client()
+    email = f"test_{uuid.uuid4().hex}@example.com"
+    usuarios = get_async_collection(USER_COLLECTION)
+    try:
+        await usuarios.insert_one({"name": "Test", "lastname": "Refresh", "email": email, "active": True, "admin": False})
+        # Lo mismo que hace /login tras autenticar con Firebase
+        inicial = create_refresh_token(*_claims(email))
+        payload = decode_refresh_token(inicial)
+        await start_session(payload["fam"], payload["jti"], payload["exp"])
+
+        primera = await _refrescar(inicial)
+        repetida = await _refrescar(inicial)
+        sucesor = await _refrescar(primera["refreshToken"]) if isinstance(primera, dict) else None
+        sesion = await sessions_coll().find_one({"_id": payload["fam"]})
+        return primera, repetida, sucesor, sesion
+    finally:
+        await usuarios.delete_many({"email": email})
+        close_async_client()
+
+
+@requiere_mongod
+def test_refresh_token_sirve_una_sola_vez():
+    primera, repetida, _, _ = asyncio.run(_sesion_con_rotaciones())
+
+    assert isinstance(primera, dict) and primera["refreshToken"], "El primer uso del refresh token debe funcionar"
+    assert isinstance(repetida, HTTPException) and repetida.status_code == 401, \
+        "Reutilizar un refresh token ya rotado debe responder 401"
+
+
+@requiere_mongod
+def test_reutilizacion_revoca_toda_la_sesion():
+    _, _, sucesor, sesion = asyncio.run(_sesion_con_rotaciones())
+
+    assert isinstance(sucesor, HTTPException) and sucesor.status_code == 401, \
+        "Tras la reutilización también el token sucesor debe quedar revocado"
+    assert sesion is None, "La sesión revocada no debe seguir en el almacén"
+
+
+def test_token_de_acceso_no_sirve_para_refresh():
+    acceso = create_jwt_token(*_claims("acceso@example.com"))
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(refresh_session(RefreshRequest(refresh_token=acceso)))
+    assert exc.value.status_code == 401, "Un token de acceso no debe aceptarse en /refresh"
+
+
+def test_refresh_token_no_sirve_como_bearer():
+    refresh = create_refresh_token(*_claims("refresh@example.com"))
+    with pytest.raises(HTTPException) as exc:
+        get_principal(refresh)
+    assert exc.value.status_code == 401, "Un refresh token no debe aceptarse como token de acceso"
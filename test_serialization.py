@@ -0,0 +1,31 @@
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from models.retos import Retos
+from utils.serialization import parse_fields, projection_for, serializer_for
+
+
+def test_fields_valida_contra_el_modelo():
+    assert parse_fields(Retos, None) is None
+    assert parse_fields(Retos, " activo , title,title") == ("activo", "title")
+    with pytest.raises(HTTPException) as exc:
+        parse_fields(Retos, "title,password")
+    assert exc.value.status_code == 400, "Un campo fuera del modelo debe rechazarse"
+
+
+def test_proyeccion_y_respuesta_recortada():
+    campos = parse_fields(Retos, "id,title")
+    assert projection_for(campos, extra=("version",)) == {"title": 1, "version": 1}
+    assert projection_for(None, base={"name": 1}) == {"name": 1}
+
+    _id = ObjectId()
+    doc = {"_id": _id, "title": "t", "version": 3}
+    assert serializer_for(Retos, campos)(doc) == {"id": str(_id), "title": "t"}, \
+        "La respuesta solo debe llevar id y los campos pedidos"
+
+
+def test_default_factory_no_se_comparte_entre_documentos():
+    a, b = serializer_for(Retos).many([{"_id": ObjectId()}, {"_id": ObjectId()}])
+    assert a["categoria_ids"] == [] and b["categoria_ids"] == []
+    assert a["categoria_ids"] is not b["categoria_ids"], "Cada documento debe tener su propia lista por defecto"
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import time
+
+from pymongo.errors import BulkWriteError, WriteError
+
+from utils.mongodb import get_async_collection
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class BatchWriterStopped(RuntimeError):
+    """El writer no está corriendo y el documento no se envió: se puede insertar directamente."""
+
+
+class BatchWriter:
+    """
+    Escritura diferida por lotes: los inserts se encolan y se envían juntos con
+    insert_many(ordered=False) cuando se junta `max_batch` o pasan `max_delay_ms`
+    desde el primero del lote. Cada llamador recibe el _id de su documento.
+    """
+
+    def __init__(self, collection: str, max_batch: int = 500, max_delay_ms: float = 20, max_queue: int = 10000):
+        self.collection = collection
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._task = None
+        self._lote = []
+        self.batches = 0
+        self.documents = 0
+        self.errors = 0
+        self.max_batch_seen = 0
+        self.total_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self._queue.maxsize)
+            self._task = asyncio.create_task(self._run())
+            self._task.add_done_callback(self._on_task_done)
+
+    async def stop(self) -> None:
+        """Envía lo pendiente y detiene el writer (se llama al apagar la app)."""
+        task = self._task
+        if task is None:
+            return
+        await self._queue.put(_STOP)
+        try:
+            await task
+        except (asyncio.CancelledError, Exception):
+            pass  # ya lo registró _on_task_done
+        self._task = None
+
+    def _on_task_done(self, task: asyncio.Task) -> None:
+        """
+        Si _run termina por algo distinto de _STOP (cancelación, error inesperado) se
+        fallan los futures pendientes y se libera _task: running pasa a False y los
+        siguientes create_comentario vuelven a insert_one en lugar de esperar para siempre.
+        """
+        if self._task is task:
+            self._task = None
+        if task.cancelled():
+            logger.error(f"Writer de {self.collection} cancelado")
+        elif task.exception() is not None:
+            logger.error(f"Writer de {self.collection} terminó con error: {task.exception()}")
+
+        # El lote en vuelo pudo quedar insertado a medias: no es seguro reintentarlo
+        for _, future in self._lote:
+            if not future.done():
+                future.set_exception(RuntimeError(f"Lote de {self.collection} interrumpido"))
+        self._lote = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP and not item[1].done():
+                item[1].set_exception(BatchWriterStopped(f"Writer de {self.collection} detenido"))
+
+    async def submit(self, doc: dict):
+        task = self._task
+        if task is None:
+            raise BatchWriterStopped(f"Writer de {self.collection} detenido")
+        future = asyncio.get_running_loop().create_future()
+        # Si la cola está llena el llamador espera (backpressure)
+        await self._queue.put((doc, future))
+        # También se vigila la tarea: si muere sin atender el documento no se espera para siempre
+        await asyncio.wait({future, task}, return_when=asyncio.FIRST_COMPLETED)
+        if not future.done():
+            raise BatchWriterStopped(f"Writer de {self.collection} detenido")
+        return future.result()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = loop.time() + self.max_delay
+            detener = False
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    detener = True
+                    break
+                batch.append(item)
+            self._lote = batch
+            await self._flush(batch)
+            self._lote = []
+            if detener:
+                return
+
+    async def _flush(self, batch: list) -> None:
+        docs = [doc for doc, _ in batch]
+        errores = {}
+        inicio = time.perf_counter()
+        try:
+            await get_async_collection(self.collection).insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            errores = {err["index"]: err for err in e.details.get("writeErrors", [])}
+        except Exception as e:
+            logger.error(f"Error insertando lote en {self.collection}: {e}")
+            self.errors += len(batch)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            duracion = (time.perf_counter() - inicio) * 1000
+            self.batches += 1
+            self.documents += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+            self.total_flush_ms += duracion
+            self.max_flush_ms = max(self.max_flush_ms, duracion)
+
+        self.errors += len(errores)
+        for i, (doc, future) in enumerate(batch):
+            if future.done():
+                continue
+            if i in errores:
+                future.set_exception(WriteError(errores[i].get("errmsg"), errores[i].get("code"), errores[i]))
+            else:
+                future.set_result(doc["_id"])
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize(),
+            "batches": self.batches,
+            "documents": self.documents,
+            "errors": self.errors,
+            "avg_batch_size": round(self.documents / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_seen,
+            "avg_flush_ms": round(self.total_flush_ms / self.batches, 2) if self.batches else 0.0,
+            "max_flush_ms": round(self.max_flush_ms, 2),
+        }
@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+def bypass_cache(request) -> bool:
+    """El cliente puede saltarse la caché en una petición con Cache-Control: no-cache"""
+    return "no-cache" in request.headers.get("cache-control", "").lower()
+
+
+class TTLCache:
+    """
+    Caché en memoria acotada: cada entrada expira a los `ttl` segundos y, al
+    superar `maxsize`, se descarta la usada hace más tiempo (LRU).
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or entry[0] < time.monotonic():
+                if entry is not _MISSING:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl: float = None) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + (ttl if ttl is not None else self.ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *keys) -> None:
+        with self._lock:
+            for key in keys:
+                if self._data.pop(key, _MISSING) is not _MISSING:
+                    self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / consultas, 4) if consultas else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+# Registro local de cachés del proceso (para métricas e invalidación por nombre)
+_caches = {}
+# Suscriptores a eventos de invalidación por colección (alimentados por utils/change_streams.py)
+_subscribers = {}
+
+
+def get_cache(name: str, maxsize: int = 1024, ttl: float = 60) -> TTLCache:
+    cache = _caches.get(name)
+    if cache is None:
+        cache = TTLCache(name, maxsize, ttl)
+        _caches[name] = cache
+    return cache
+
+
+def cache_stats() -> dict:
+    return {name: cache.stats() for name, cache in _caches.items()}
+
+
+def subscribe(collection: str, handler) -> None:
+    """Registra handler(doc_id) para los cambios de la colección; doc_id=None significa invalidar todo."""
+    _subscribers.setdefault(collection, []).append(handler)
+
+
+def unsubscribe(collection: str, handler) -> None:
+    """Retira un handler registrado con subscribe; no hace nada si no estaba."""
+    handlers = _subscribers.get(collection, [])
+    if handler in handlers:
+        handlers.remove(handler)
+
+
+def subscribed_collections() -> list:
+    """Colecciones con al menos un suscriptor (las únicas que necesita escuchar el change stream)."""
+    return sorted(c for c, handlers in _subscribers.items() if c and handlers)
+
+
+def publish_invalidation(collection: str, doc_id: str = None) -> None:
+    for handler in _subscribers.get(collection, []):
+        handler(doc_id)
+
+
+def publish_invalidation_all() -> None:
+    for collection in list(_subscribers):
+        publish_invalidation(collection)
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import os
+
+from dotenv import load_dotenv
+from pymongo.errors import OperationFailure, PyMongoError
+
+from utils.cache import publish_invalidation, publish_invalidation_all, subscribed_collections
+from utils.mongodb import get_database
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+CHANGE_STREAMS_ENABLED = os.getenv("CHANGE_STREAMS_ENABLED", "1") == "1"
+MAX_BACKOFF_S = 30
+
+# Códigos de error de MongoDB
+NOT_A_REPLICA_SET = 40573
+CHANGE_STREAM_HISTORY_LOST = 286
+INVALIDATING_OPERATIONS = {"drop", "rename", "dropDatabase", "invalidate"}
+
+
+class ChangeStreamListener:
+    """
+    Escucha los cambios de las colecciones cacheadas y publica eventos de invalidación
+    en el registro local de cachés, para que todos los workers vean las escrituras de los demás.
+    Guarda el resume token de cada evento y lo usa para reanudar tras una reconexión.
+    Sin colecciones explícitas escucha solo las que tienen suscriptores en utils/cache.
+    """
+
+    def __init__(self, collections=None):
+        self.collections = collections
+        self.resume_token = None
+        self.events = 0
+        self.reconnects = 0
+        self.running = False
+        self._task = None
+
+    def _watched(self) -> list:
+        return self.collections or subscribed_collections()
+
+    def start(self) -> None:
+        if not self._watched():
+            logger.info("Ninguna colección con suscriptores; change stream no iniciado")
+            return
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _pipeline(self) -> list:
+        return [
+            {"$match": {"ns.coll": {"$in": self._watched()}}},
+            # Solo lo necesario para invalidar: sin fullDocument ni updateDescription
+            # (_id es el resume token y no se puede quitar)
+            {"$project": {"operationType": 1, "ns": 1, "documentKey": 1}}
+        ]
+
+    def _publish(self, change: dict) -> None:
+        self.events += 1
+        operation = change["operationType"]
+        if operation in INVALIDATING_OPERATIONS:
+            if operation == "invalidate":
+                # Después de un invalidate no se puede reanudar con resume_after
+                self.resume_token = None
+            collection = change.get("ns", {}).get("coll")
+            if collection:
+                publish_invalidation(collection)
+            else:
+                publish_invalidation_all()
+            return
+        doc_id = change.get("documentKey", {}).get("_id")
+        publish_invalidation(change["ns"]["coll"], str(doc_id) if doc_id is not None else None)
+
+    async def _run(self) -> None:
+        backoff = 1
+        while True:
+            try:
+                async with get_database().watch(self._pipeline(), resume_after=self.resume_token) as stream:
+                    self.running = True
+                    backoff = 1
+                    async for change in stream:
+                        self.resume_token = stream.resume_token
+                        self._publish(change)
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code == NOT_A_REPLICA_SET:
+                    logger.warning("Change streams no disponibles (MongoDB no es replica set); invalidación solo local")
+                    self.running = False
+                    return
+                if e.code == CHANGE_STREAM_HISTORY_LOST:
+                    # El token ya no está en el oplog: se perdieron eventos, se vacían las cachés
+                    logger.warning("Resume token expirado; se invalidan todas las cachés")
+                    self.resume_token = None
+                    publish_invalidation_all()
+                else:
+                    logger.error(f"Error en change stream: {e}")
+            except PyMongoError as e:
+                logger.error(f"Change stream desconectado: {e}")
+            finally:
+                self.running = False
+
+            self.reconnects += 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF_S)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "collections": self._watched(),
+            "events": self.events,
+            "reconnects": self.reconnects,
+        }
+
+
+change_listener = ChangeStreamListener()
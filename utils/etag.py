@@ -0,0 +1,38 @@
+import hashlib
+
+from fastapi import Request, Response
+
+
+def etag_from_version(doc_id: str, version: int, variant: tuple = None) -> str:
+    """
+    ETag fuerte a partir del campo version del documento (se incrementa en cada escritura).
+    "variant" distingue representaciones parciales del mismo documento (?fields=).
+    """
+    if variant:
+        return f'"{doc_id}-{version or 0}-{",".join(variant)}"'
+    return f'"{doc_id}-{version or 0}"'
+
+
+def etag_from_versions(docs: list, variant: tuple = None) -> str:
+    """ETag fuerte de un listado: hash barato de los pares id:version, sin serializar la respuesta"""
+    digest = hashlib.blake2b(digest_size=16)
+    if variant:
+        digest.update(f"fields={','.join(variant)};".encode())
+    for doc in docs:
+        digest.update(f"{doc['id']}:{doc.get('version') or 0};".encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Comparación débil (RFC 9110): se ignora el prefijo W/ en peticiones GET
+    candidatos = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidatos
+
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
@@ -0,0 +1,93 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+
+load_dotenv()
+
+FIREBASE_MAX_WORKERS = int(os.getenv("FIREBASE_MAX_WORKERS", "8"))
+FIREBASE_MAX_QUEUE = int(os.getenv("FIREBASE_MAX_QUEUE", "200"))
+
+
+class BoundedExecutor:
+    """
+    Pool de hilos acotado para llamadas bloqueantes (SDKs síncronos).
+    Limita las llamadas concurrentes y la cola de espera, y expone su profundidad y latencias.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_wait_ms = 0.0
+        self.total_run_ms = 0.0
+        self.max_latency_ms = 0.0
+
+    async def run(self, fn, *args, **kwargs):
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise HTTPException(status_code=503, detail="Servicio ocupado, intenta de nuevo")
+            self.queued += 1
+
+        encolado = time.perf_counter()
+
+        def _job():
+            inicio = time.perf_counter()
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+                self.total_wait_ms += (inicio - encolado) * 1000
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                fin = time.perf_counter()
+                with self._lock:
+                    self.running -= 1
+                    self.total_run_ms += (fin - inicio) * 1000
+                    self.max_latency_ms = max(self.max_latency_ms, (fin - encolado) * 1000)
+
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(self._pool, _job)
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        with self._lock:
+            self.completed += 1
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            terminados = self.completed + self.failed
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self.total_wait_ms / terminados, 2) if terminados else 0.0,
+                "avg_run_ms": round(self.total_run_ms / terminados, 2) if terminados else 0.0,
+                "max_latency_ms": round(self.max_latency_ms, 2),
+            }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True)
+
+
+# Ejecutor dedicado al Firebase Admin SDK
+firebase_executor = BoundedExecutor("firebase", FIREBASE_MAX_WORKERS, FIREBASE_MAX_QUEUE)
@@ -0,0 +1,64 @@
+import asyncio
+import logging
+import os
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# URL base del Identity Toolkit; se puede apuntar a un stub local en pruebas y pruebas de carga
+FIREBASE_AUTH_URL = os.getenv("FIREBASE_AUTH_URL", "https://identitytoolkit.googleapis.com/v1")
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY_S = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_S", "30"))
+HTTP_TIMEOUT_S = float(os.getenv("HTTP_TIMEOUT_S", "10"))
+HTTP_CONNECT_TIMEOUT_S = float(os.getenv("HTTP_CONNECT_TIMEOUT_S", "3"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+HTTP_BACKOFF_S = float(os.getenv("HTTP_BACKOFF_S", "0.2"))
+
+# Respuestas del upstream que vale la pena reintentar
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+_http_client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Cliente HTTP asíncrono compartido (keep-alive y límites de conexión). Lo abre el lifespan."""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(HTTP_TIMEOUT_S, connect=HTTP_CONNECT_TIMEOUT_S),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_S
+            )
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+async def post_json(url: str, payload: dict, params: dict = None) -> httpx.Response:
+    """POST con reintentos y backoff exponencial ante errores de red o 429/5xx"""
+    client = get_http_client()
+    for intento in range(HTTP_MAX_RETRIES + 1):
+        try:
+            response = await client.post(url, json=payload, params=params)
+            if response.status_code not in RETRY_STATUS or intento == HTTP_MAX_RETRIES:
+                return response
+            logger.warning(f"Upstream respondió {response.status_code}, reintentando ({intento + 1})")
+        except httpx.TransportError as e:
+            if intento == HTTP_MAX_RETRIES:
+                raise
+            logger.warning(f"Error de red hacia upstream: {e}, reintentando ({intento + 1})")
+        await asyncio.sleep(HTTP_BACKOFF_S * (2 ** intento))
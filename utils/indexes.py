@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import sys
+
+from pymongo.errors import PyMongoError
+
+from models.indexes import INDEXES
+from utils.mongodb import get_async_collection, connect_async_client, close_async_client
+
+logger = logging.getLogger(__name__)
+
+# Reintento de la creación de índices al arrancar (backoff exponencial con tope)
+INDEX_RETRY_MAX_S = 300
+
+
+def _declared(index) -> dict:
+    doc = index.document
+    return {
+        "key": list(doc["key"].items()),
+        "unique": bool(doc.get("unique", False)),
+        "expireAfterSeconds": doc.get("expireAfterSeconds"),
+        "collation": doc.get("collation"),
+    }
+
+
+def _actual(info: dict, declarado: dict = None) -> dict:
+    collation = info.get("collation")
+    if collation and declarado and declarado.get("collation"):
+        # La BD devuelve la collation completa; se comparan solo las opciones declaradas
+        collation = {k: collation.get(k) for k in declarado["collation"]}
+    return {
+        "key": list(info["key"].items()),
+        "unique": bool(info.get("unique", False)),
+        "expireAfterSeconds": info.get("expireAfterSeconds"),
+        "collation": collation,
+    }
+
+
+async def apply_indexes(collections=None) -> list:
+    """
+    Crea los índices declarados en models/indexes.py. Es idempotente: los existentes no se tocan.
+    Devuelve las colecciones cuyos índices no se pudieron crear (lista vacía si todo fue bien).
+    """
+    fallidas = []
+    for name, indexes in INDEXES.items():
+        if collections and name not in collections:
+            continue
+        try:
+            await get_async_collection(name).create_indexes(indexes)
+        except PyMongoError as e:
+            # Ej.: un índice con el mismo nombre pero otra definición, o datos que violan un
+            # índice único (nombres de categoría duplicados); se reporta también en el diff
+            logger.error(f"No se pudieron crear los índices de {name}: {e}")
+            fallidas.append(name)
+    return fallidas
+
+
+class IndexBootstrap:
+    """
+    Aplica los índices al arrancar y reintenta en segundo plano hasta que todos
+    existen. Varias garantías (unicidad, TTL) dependen solo de los índices, así que
+    /ready no reporta la app como lista mientras falte alguno.
+    """
+
+    def __init__(self):
+        self._task = None
+        self.ready = False
+        self.pendientes = sorted(INDEXES)
+        self.intentos = 0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        backoff = 1
+        while True:
+            self.intentos += 1
+            self.pendientes = await apply_indexes(self.pendientes)
+            if not self.pendientes:
+                self.ready = True
+                logger.info("Índices aplicados")
+                return
+            logger.warning(f"Índices pendientes en {self.pendientes}; reintento en {backoff}s")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, INDEX_RETRY_MAX_S)
+
+    def stats(self) -> dict:
+        return {"ready": self.ready, "pendientes": self.pendientes, "intentos": self.intentos}
+
+
+index_bootstrap = IndexBootstrap()
+
+
+async def diff_indexes() -> dict:
+    """Compara índices declarados contra los existentes en la BD"""
+    diff = {}
+    for name, indexes in INDEXES.items():
+        actual = {}
+        async for info in get_async_collection(name).list_indexes():
+            if info["name"] == "_id_":
+                continue
+            actual[info["name"]] = info
+        declarados = {index.document["name"]: _declared(index) for index in indexes}
+        actual = {n: _actual(info, declarados.get(n)) for n, info in actual.items()}
+
+        diff[name] = {
+            "missing": sorted(n for n in declarados if n not in actual),
+            "extra": sorted(n for n in actual if n not in declarados),
+            "changed": sorted(n for n in declarados if n in actual and declarados[n] != actual[n]),
+        }
+    return diff
+
+
+async def _main(command: str) -> int:
+    connect_async_client()
+    try:
+        if command == "apply":
+            await apply_indexes()
+        diff = await diff_indexes()
+    finally:
+        close_async_client()
+
+    pendiente = False
+    for name, cambios in diff.items():
+        estado = "ok"
+        if any(cambios.values()):
+            pendiente = True
+            estado = ", ".join(f"{k}: {v}" for k, v in cambios.items() if v)
+        print(f"{name:<20} {estado}")
+    return 1 if pendiente else 0
+
+
+if __name__ == "__main__":
+    # Uso: python -m utils.indexes [diff|apply]
+    comando = sys.argv[1] if len(sys.argv) > 1 else "diff"
+    if comando not in ("diff", "apply"):
+        print("Uso: python -m utils.indexes [diff|apply]")
+        sys.exit(2)
+    sys.exit(asyncio.run(_main(comando)))
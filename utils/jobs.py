@@ -0,0 +1,39 @@
+import asyncio
+import sys
+
+from utils.mongodb import connect_async_client, close_async_client
+
+# Jobs de mantenimiento. Uso: python -m utils.jobs <job>
+
+
+async def _rebuild_category_counters() -> None:
+    from controllers.categorias_controller import reconstruir_contadores_categorias
+    actualizadas = await reconstruir_contadores_categorias()
+    print(f"Contadores recalculados en {actualizadas} categorías")
+
+
+async def _backfill_reto_categoria_ids() -> None:
+    from controllers.Retos_categoria import reconstruir_categoria_ids
+    actualizados = await reconstruir_categoria_ids()
+    print(f"categoria_ids recalculado en {actualizados} retos")
+
+
+JOBS = {
+    "rebuild-category-counters": _rebuild_category_counters,
+    "backfill-reto-categoria-ids": _backfill_reto_categoria_ids,
+}
+
+
+async def _main(job: str) -> None:
+    connect_async_client()
+    try:
+        await JOBS[job]()
+    finally:
+        close_async_client()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in JOBS:
+        print(f"Uso: python -m utils.jobs [{'|'.join(JOBS)}]")
+        sys.exit(2)
+    asyncio.run(_main(sys.argv[1]))
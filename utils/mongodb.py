@@ -2,6 +2,7 @@ import os
 from dotenv import load_dotenv
 from pymongo import MongoClient
 from pymongo.server_api import ServerApi
+from motor.motor_asyncio import AsyncIOMotorClient
 
 load_dotenv()
 
@@ -9,6 +10,13 @@ DB = os.getenv("DATABASE_NAME")
 URI = os.getenv("MONGODB_URI")
 col = os.getenv("USER_COLLECTION")
 
+# Configuración del pool de conexiones (un único pool por proceso/worker)
+MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000"))
+WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+
 
 if not DB:
     raise ValueError("Database name not found. Set DATABASE_NAME or MONGO_DB_NAME environment variable")
@@ -16,29 +24,75 @@ if not URI:
     raise ValueError("MongoDB URI not found. Set MONGODB_URI or URI environment variable")
 
 _client = None
+_async_client = None
+_collections = {}
+
+
+def pool_options() -> dict:
+    """Opciones del pool compartidas por el cliente síncrono y el asíncrono"""
+    return {
+        "server_api": ServerApi("1"),
+        "maxPoolSize": MAX_POOL_SIZE,
+        "minPoolSize": MIN_POOL_SIZE,
+        "maxIdleTimeMS": MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": WAIT_QUEUE_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": SERVER_SELECTION_TIMEOUT_MS,
+    }
+
 
 def get_mongo_client():
     global _client
     if _client is None:
         _client = MongoClient(
             URI,
-            server_api=ServerApi("1"),
             tls=True,
             tlsAllowInvalidCertificates=True,
-            serverSelectionTimeoutMS=5000  # Timeout más corto
+            **pool_options()
         )
     return _client
 
 
 def get_collection(col):
-    client = MongoClient(  
-        URI
-        , server_api = ServerApi("1")
-        , tls = True
-        , tlsAllowInvalidCertificates = True
-    )
-    client.admin.command("ping")
-    return client[DB][col]
+    """Colección síncrona sobre el cliente compartido (sin abrir conexiones nuevas ni hacer ping)"""
+    return get_mongo_client()[DB][col]
+
+
+# --- Capa asíncrona (Motor) usada por todos los controladores ---
+
+def connect_async_client() -> AsyncIOMotorClient:
+    """Crea (una sola vez) el cliente Motor con el pool acotado. Lo llama el lifespan de la app."""
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncIOMotorClient(URI, **pool_options())
+    return _async_client
+
+
+def close_async_client() -> None:
+    """Cierra el pool asíncrono. Lo llama el lifespan al apagar la app."""
+    global _async_client
+    if _async_client is not None:
+        _async_client.close()
+        _async_client = None
+    _collections.clear()
+
+
+def get_database():
+    return connect_async_client()[DB]
+
+
+def get_async_collection(name: str):
+    """Devuelve la colección indicada sobre el pool compartido (el handle se cachea)"""
+    coll = _collections.get(name)
+    if coll is None:
+        coll = get_database()[name]
+        _collections[name] = coll
+    return coll
+
+
+async def ping_database() -> bool:
+    """Health check de la BD; se usa en el arranque y en /ready, nunca en el camino de una petición"""
+    await connect_async_client().admin.command("ping")
+    return True
 
 
 def t_connection():
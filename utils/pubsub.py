@@ -0,0 +1,84 @@
+import asyncio
+import json
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "100"))
+SSE_HEARTBEAT_S = float(os.getenv("SSE_HEARTBEAT_S", "15"))
+
+
+class Subscriber:
+    def __init__(self, topic: str, maxsize: int):
+        self.topic = topic
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = False
+
+
+class FanOutHub:
+    """
+    Hub en proceso (uno por worker) que reparte eventos por tema a todos sus suscriptores.
+    Cada suscriptor tiene una cola acotada; si se llena (cliente lento), se le desconecta
+    en lugar de frenar a los demás o acumular memoria.
+    """
+
+    def __init__(self, queue_size: int = SSE_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._topics = {}
+        self.published = 0
+        self.slow_disconnects = 0
+
+    def subscribe(self, topic: str) -> Subscriber:
+        subscriber = Subscriber(topic, self.queue_size)
+        self._topics.setdefault(topic, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        subscribers = self._topics.get(subscriber.topic)
+        if subscribers is None:
+            return
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del self._topics[subscriber.topic]
+
+    def publish(self, topic: str, event: str, data: dict) -> None:
+        self.published += 1
+        for subscriber in list(self._topics.get(topic, ())):
+            try:
+                subscriber.queue.put_nowait((event, data))
+            except asyncio.QueueFull:
+                subscriber.dropped = True
+                self.slow_disconnects += 1
+                self.unsubscribe(subscriber)
+
+    def stats(self) -> dict:
+        return {
+            "topics": len(self._topics),
+            "subscribers": sum(len(s) for s in self._topics.values()),
+            "published": self.published,
+            "slow_disconnects": self.slow_disconnects,
+        }
+
+
+async def sse_events(hub: FanOutHub, topic: str, request, heartbeat: float = SSE_HEARTBEAT_S):
+    """Generador Server-Sent Events para un tema; envía un heartbeat si no hay eventos."""
+    subscriber = hub.subscribe(topic)
+    try:
+        yield "retry: 3000\n\n"
+        while not subscriber.dropped:
+            try:
+                event, data = await asyncio.wait_for(subscriber.queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: {event}\ndata: {json.dumps(data, default=str, ensure_ascii=False)}\n\n"
+    finally:
+        hub.unsubscribe(subscriber)
+
+
+# Hub de comentarios en vivo, por reto
+comentarios_hub = FanOutHub()
@@ -0,0 +1,49 @@
+from datetime import datetime, timezone
+
+from utils.cache import get_cache
+from utils.mongodb import get_async_collection
+
+# Almacén compacto de sesiones: un único documento {_id: fam, jti, expires_at} por
+# sesión, con el jti del refresh token vigente. Rotar es un solo update condicionado
+# al jti anterior; si no coincide, el token ya se había rotado (reutilización) o la
+# sesión fue revocada. El índice TTL "expires_at_ttl" borra la sesión cuando su
+# último refresh token expira.
+SESSIONS_COLLECTION = "RefreshSessions"
+
+# Las sesiones revocadas nunca vuelven a ser válidas, se pueden recordar localmente
+_familias_revocadas = get_cache("revoked_sessions", maxsize=10000, ttl=3600)
+
+
+def sessions_coll():
+    return get_async_collection(SESSIONS_COLLECTION)
+
+
+def _expira(exp) -> datetime:
+    return datetime.fromtimestamp(exp, timezone.utc)
+
+
+async def start_session(fam: str, jti: str, exp) -> None:
+    """Registra una sesión nueva con su primer refresh token."""
+    await sessions_coll().insert_one({"_id": fam, "jti": jti, "expires_at": _expira(exp)})
+
+
+async def rotate_refresh_token(fam: str, jti: str, nuevo_jti: str, exp) -> bool:
+    """
+    Sustituye el jti vigente de la sesión por el del nuevo refresh token. Devuelve
+    False si el token presentado no es el vigente: en ese caso se revoca la sesión.
+    """
+    if _familias_revocadas.get(fam):
+        return False
+    result = await sessions_coll().update_one(
+        {"_id": fam, "jti": jti},
+        {"$set": {"jti": nuevo_jti, "expires_at": _expira(exp)}}
+    )
+    if result.matched_count:
+        return True
+    await revoke_family(fam)
+    return False
+
+
+async def revoke_family(fam: str) -> None:
+    _familias_revocadas.set(fam, True)
+    await sessions_coll().delete_one({"_id": fam})
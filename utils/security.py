@@ -1,18 +1,65 @@
 import os
+import time
+import uuid
+import hashlib
 import jwt
 
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
+from types import MappingProxyType
 from fastapi import HTTPException, Depends, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from jwt import PyJWTError
 from functools import wraps
 
+from utils.cache import get_cache
+
 load_dotenv()
 
 SECRET_KEY = os.getenv("SECRET_KEY")
+REFRESH_TOKEN_DAYS = int(os.getenv("REFRESH_TOKEN_DAYS", "14"))
 security = HTTPBearer()
 
+# Caché de tokens ya verificados: clave = digest del token, expira con el "exp" del token
+token_cache = get_cache("auth_tokens", maxsize=int(os.getenv("AUTH_CACHE_MAXSIZE", "10000")), ttl=3600)
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Usuario autenticado, calculado una sola vez por token"""
+    id: str
+    email: str
+    firstname: str
+    lastname: str
+    active: bool
+    admin: bool
+    exp: float
+    claims: MappingProxyType = field(repr=False, compare=False, default=None)
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> "Principal":
+        admin = bool(payload.get("admin", False))
+        claims = MappingProxyType({
+            "id": payload.get("id"),
+            "email": payload.get("email"),
+            "firstname": payload.get("firstname"),
+            "lastname": payload.get("lastname"),
+            "active": payload.get("active"),
+            "role": "admin" if admin else "user"
+        })
+        return cls(
+            id=payload.get("id"),
+            email=payload.get("email"),
+            firstname=payload.get("firstname"),
+            lastname=payload.get("lastname"),
+            active=bool(payload.get("active")),
+            admin=admin,
+            exp=float(payload["exp"]),
+            claims=claims
+        )
+
+
 # Función para crear un JWT
 def create_jwt_token(
         firstname:str
@@ -39,171 +86,139 @@ def create_jwt_token(
     )
     return token
 
-def validateuser(func):
-    @wraps(func)
-    async def wrapper( *args, **kwargs ):
-        request = kwargs.get('request')
-        if not request:
-            raise HTTPException( status_code=400, detail="Request object not found"  )
-
-        authorization: str = request.headers.get("Authorization")
-        if not authorization:
-            raise HTTPException( status_code=400, detail="Authorization header missing"  )
-
-        schema, token = authorization.split()
-        if schema.lower() != "bearer":
-            raise HTTPException( status_code=400, detail="Invalid auth schema"  )
-
-        try:
-            payload = jwt.decode( token , SECRET_KEY, algorithms=["HS256"] )
 
-            email = payload.get("email")
-            firstname = payload.get("firstname")
-            lastname = payload.get("lastname")
-            active = payload.get("active")
-            exp = payload.get("exp")
-            id = payload.get("id")
-
-            if email is None:
-                raise HTTPException( status_code=401 , detail="Token Invalid" )
-
-            if datetime.utcfromtimestamp(exp) < datetime.utcnow():
-                raise HTTPException( status_code=401 , detail="Expired token" )
+def create_refresh_token(
+        firstname: str
+        , lastname: str
+        , email: str
+        , active: bool
+        , admin: bool
+        , id: str
+        , family: str = None
+):
+    """
+    Refresh token firmado localmente. "jti" identifica al token (para rotación)
+    y "fam" a la sesión completa (para revocarla si se reutiliza un token rotado).
+    """
+    now = datetime.utcnow()
+    return jwt.encode(
+        {
+            "typ": "refresh",
+            "jti": uuid.uuid4().hex,
+            "fam": family or uuid.uuid4().hex,
+            "id": id,
+            "firstname": firstname,
+            "lastname": lastname,
+            "email": email,
+            "active": active,
+            "admin": admin,
+            "exp": now + timedelta(days=REFRESH_TOKEN_DAYS),
+            "iat": now
+        },
+        SECRET_KEY,
+        algorithm="HS256"
+    )
 
-            if not active:
-                raise HTTPException( status_code=401 , detail="Inactive user" )
 
-            request.state.email = email
-            request.state.firstname = firstname
-            request.state.lastname = lastname
-            request.state.id = id
+def decode_refresh_token(token: str) -> dict:
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"], options={"require": ["exp", "jti", "fam"]})
+    except PyJWTError:
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    if payload.get("typ") != "refresh":
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    return payload
+
+
+def _token_key(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+def get_principal(token: str) -> Principal:
+    """
+    Verifica el token y devuelve su Principal. Los tokens válidos se guardan en
+    una caché acotada hasta su "exp", así jwt.decode se ejecuta una vez por token.
+    """
+    key = _token_key(token)
+    principal = token_cache.get(key)
+    if principal is not None:
+        if principal.exp <= time.time():
+            token_cache.invalidate(key)
+            raise HTTPException(status_code=401, detail="Expired token")
+        return principal
 
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"], options={"require": ["exp"]})
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Expired token")
+    except PyJWTError:
+        raise HTTPException(status_code=401, detail="Invalid token or expired token")
 
-        except PyJWTError:
-            raise HTTPException( status_code=401, detail="Invalid token or expired token"  )
+    # Un refresh token no sirve como token de acceso
+    if payload.get("email") is None or payload.get("typ") == "refresh":
+        raise HTTPException(status_code=401, detail="Token Invalid")
 
-        return await func( *args, **kwargs )
-    return wrapper
+    principal = Principal.from_payload(payload)
+    token_cache.set(key, principal, ttl=principal.exp - time.time())
+    return principal
 
-def validateadmin(func):
-    @wraps(func)
-    async def wrapper( *args, **kwargs ):
-        request = kwargs.get('request')
-        if not request:
-            raise HTTPException( status_code=400, detail="Request object not found"  )
 
-        authorization: str = request.headers.get("Authorization")
-        if not authorization:
-            raise HTTPException( status_code=400, detail="Authorization header missing"  )
+def _authorize(principal: Principal, require_admin: bool) -> None:
+    if require_admin:
+        if not principal.active or not principal.admin:
+            raise HTTPException(status_code=401, detail="Inactive user or not admin")
+    elif not principal.active:
+        raise HTTPException(status_code=401, detail="Inactive user")
 
-        schema, token = authorization.split()
-        if schema.lower() != "bearer":
-            raise HTTPException( status_code=400, detail="Invalid auth schema"  )
 
-        try:
-            payload = jwt.decode( token , SECRET_KEY, algorithms=["HS256"] )
+def _bearer_token(request: Request) -> str:
+    authorization: str = request.headers.get("Authorization")
+    if not authorization:
+        raise HTTPException( status_code=400, detail="Authorization header missing"  )
 
-            email = payload.get("email")
-            firstname = payload.get("firstname")
-            lastname = payload.get("lastname")
-            active = payload.get("active")
-            admin = payload.get("admin")
-            exp = payload.get("exp")
-            id = payload.get("id")
+    partes = authorization.split()
+    if len(partes) != 2 or partes[0].lower() != "bearer":
+        raise HTTPException( status_code=400, detail="Invalid auth schema"  )
+    return partes[1]
 
-            if email is None:
-                raise HTTPException( status_code=401 , detail="Token Invalid" )
 
-            if datetime.utcfromtimestamp(exp) < datetime.utcnow():
-                raise HTTPException( status_code=401 , detail="Expired token" )
+def _require(require_admin: bool):
+    def decorator(func):
+        @wraps(func)
+        async def wrapper( *args, **kwargs ):
+            request = kwargs.get('request')
+            if not request:
+                raise HTTPException( status_code=400, detail="Request object not found"  )
 
-            if not active or not admin:
-                raise HTTPException( status_code=401 , detail="Inactive user or not admin" )
+            principal = get_principal(_bearer_token(request))
+            _authorize(principal, require_admin)
 
-            request.state.email = email
-            request.state.firstname = firstname
-            request.state.lastname = lastname
-            request.state.admin = admin
-            request.state.id = id
+            request.state.email = principal.email
+            request.state.firstname = principal.firstname
+            request.state.lastname = principal.lastname
+            request.state.id = principal.id
+            if require_admin:
+                request.state.admin = principal.admin
 
+            return await func( *args, **kwargs )
+        return wrapper
+    return decorator
 
-        except PyJWTError:
-            raise HTTPException( status_code=401, detail="Invalid token or expired token"  )
 
-        return await func( *args, **kwargs )
-    return wrapper
+validateuser = _require(require_admin=False)
+validateadmin = _require(require_admin=True)
 
 
 # Funciones para FastAPI Dependency Injection
 def validate_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     """Validar token JWT para usuarios autenticados - Para usar con Depends()"""
-    token = credentials.credentials
-    
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-
-        email = payload.get("email")
-        firstname = payload.get("firstname")
-        lastname = payload.get("lastname")
-        active = payload.get("active")
-        admin = payload.get("admin", False)
-        exp = payload.get("exp")
-        user_id = payload.get("id")
-
-        if email is None:
-            raise HTTPException(status_code=401, detail="Token Invalid")
-        
-        if datetime.utcfromtimestamp(exp) < datetime.utcnow():
-            raise HTTPException(status_code=401, detail="Expired token")
-        
-        if not active:
-            raise HTTPException(status_code=401, detail="Inactive user")
-        
-        return {
-            "id": user_id,
-            "email": email,
-            "firstname": firstname,
-            "lastname": lastname,
-            "active": active,
-            "role": "admin" if admin else "user"
-        }
-        
-    except PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token or expired token")
+    principal = get_principal(credentials.credentials)
+    _authorize(principal, require_admin=False)
+    return principal.claims
 
 
 def validate_admin(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     """Validar token JWT para administradores - Para usar con Depends()"""
-    token = credentials.credentials
-    
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-
-        email = payload.get("email")
-        firstname = payload.get("firstname")
-        lastname = payload.get("lastname")
-        active = payload.get("active")
-        admin = payload.get("admin", False)
-        exp = payload.get("exp")
-        user_id = payload.get("id")
-
-        if email is None:
-            raise HTTPException(status_code=401, detail="Token Invalid")
-        
-        if datetime.utcfromtimestamp(exp) < datetime.utcnow():
-            raise HTTPException(status_code=401, detail="Expired token")
-        
-        if not active or not admin:
-            raise HTTPException(status_code=401, detail="Inactive user or not admin")
-        
-        return {
-            "id": user_id,
-            "email": email,
-            "firstname": firstname,
-            "lastname": lastname,
-            "active": active,
-            "role": "admin"
-        }
-        
-    except PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token or expired token")
\ No newline at end of file
+    principal = get_principal(credentials.credentials)
+    _authorize(principal, require_admin=True)
+    return principal.claims
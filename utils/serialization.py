@@ -0,0 +1,100 @@
+import orjson
+from functools import lru_cache
+from typing import Optional
+from bson import ObjectId
+from fastapi import HTTPException, Response
+from pydantic import BaseModel
+from pydantic_core import PydanticUndefined
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError
+
+
+def _default_de(model: type[BaseModel], nombre: str) -> tuple:
+    """(default, default_factory) del campo; la factory se llama por documento, nunca se comparte su valor"""
+    info = model.model_fields[nombre]
+    if info.default_factory is not None:
+        return None, info.default_factory
+    return (None if info.default is PydanticUndefined else info.default), None
+
+
+class DocSerializer:
+    """
+    Convierte documentos BSON en dicts con la forma del modelo de respuesta, sin
+    construir ni validar instancias Pydantic. Los campos y sus valores por defecto
+    se calculan una sola vez a partir del modelo (las default_factory se llaman por documento).
+    """
+
+    def __init__(self, model: type[BaseModel], fields=None):
+        nombres = [n for n in model.model_fields if fields is None or n in fields or n == "id"]
+        self.fields = tuple(
+            (nombre, *_default_de(model, nombre))
+            for nombre in nombres
+        )
+
+    def __call__(self, doc: dict) -> dict:
+        out = {}
+        for nombre, default, factory in self.fields:
+            if nombre == "id":
+                _id = doc.get("_id", doc.get("id"))
+                out["id"] = str(_id) if _id is not None else None
+            elif nombre in doc:
+                out[nombre] = doc[nombre]
+            else:
+                out[nombre] = factory() if factory is not None else default
+        return out
+
+    def many(self, docs) -> list:
+        return [self(doc) for doc in docs]
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=_default)
+
+
+def fast_json_response(content, status_code: int = 200, headers: dict = None) -> Response:
+    """Respuesta JSON serializada con orjson, saltándose la validación del response_model"""
+    return Response(dumps(content), status_code=status_code, headers=headers, media_type="application/json")
+
+
+# --- Sparse fieldsets (?fields=a,b,c) ---
+
+def parse_fields(model: type[BaseModel], fields: Optional[str]) -> Optional[tuple]:
+    """
+    Valida el parámetro "fields" contra los campos del modelo. Devuelve una tupla
+    ordenada y sin repetidos, o None si no se pidió ningún subconjunto.
+    """
+    if not fields:
+        return None
+    pedidos = {f.strip() for f in fields.split(",") if f.strip()}
+    if not pedidos:
+        return None
+    desconocidos = pedidos - set(model.model_fields)
+    if desconocidos:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Campos no válidos en fields: {', '.join(sorted(desconocidos))}"
+        )
+    return tuple(sorted(pedidos))
+
+
+def projection_for(fields: Optional[tuple], base: dict = None, extra: tuple = ()) -> Optional[dict]:
+    """
+    Proyección de Mongo para los campos pedidos. "id" sale de _id (siempre incluido);
+    "extra" son campos que el servidor necesita aunque no se devuelvan (p. ej. version
+    para el ETag). Sin fields se usa la proyección base del controlador.
+    """
+    if fields is None:
+        return base
+    proyeccion = {nombre: 1 for nombre in fields if nombre != "id"}
+    proyeccion.update({nombre: 1 for nombre in extra})
+    return proyeccion
+
+
+@lru_cache(maxsize=256)
+def serializer_for(model: type[BaseModel], fields: Optional[tuple] = None) -> DocSerializer:
+    """DocSerializer cacheado por (modelo, fields): el mapeo se calcula una vez por combinación"""
+    return DocSerializer(model, fields)
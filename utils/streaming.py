@@ -0,0 +1,38 @@
+import os
+
+from dotenv import load_dotenv
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from utils.serialization import dumps
+
+load_dotenv()
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "500"))
+MAX_STREAM_BATCH_SIZE = 5000
+
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+async def _ndjson_lines(docs, batch_size: int):
+    """
+    Escribe un documento por línea a medida que llegan del cursor de Motor.
+    Se agrupan hasta `batch_size` líneas por escritura; el generador solo pide
+    el siguiente lote al cursor cuando el cliente consumió el anterior (backpressure),
+    así la memoria se mantiene constante sin importar el tamaño del resultado.
+    """
+    buffer = []
+    async for doc in docs:
+        buffer.append(dumps(doc))
+        if len(buffer) >= batch_size:
+            yield b"\n".join(buffer) + b"\n"
+            buffer = []
+    if buffer:
+        yield b"\n".join(buffer) + b"\n"
+
+
+def ndjson_response(docs, batch_size: int = STREAM_BATCH_SIZE) -> StreamingResponse:
+    return StreamingResponse(_ndjson_lines(docs, batch_size), media_type=NDJSON_MEDIA_TYPE)